@@ -0,0 +1,60 @@
+from pathlib import Path
+from abnamroparser import tsvparser
+from transaction_services.statement_file_processing.lib.abn_statement_processing import (
+    AbnStatementProcessor,
+)
+from .statement_generators import generate_abn_tsv
+import polars as pl
+import argparse
+import json
+import tempfile
+import time
+
+
+def _encode_with_map_elements(df: pl.DataFrame) -> pl.Series:
+    return df.select(
+        pl.col("desc_json").map_elements(json.dumps, return_dtype=pl.String)
+    ).to_series()
+
+
+def _encode_with_json_encode(df: pl.DataFrame) -> pl.Series:
+    return df.select(pl.col("desc_json").struct.json_encode()).to_series()
+
+
+def _best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare per-row json.dumps with native struct JSON encoding of ABN desc_json"
+    )
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tsv_path = generate_abn_tsv(Path(tmp_dir) / "synthetic.TAB", args.rows)
+        df = pl.DataFrame(tsvparser.convert_tsv_to_json_like(tsv_path)).rename(
+            mapping=AbnStatementProcessor.file_to_table_columnn_map
+        )
+        parse_seconds = _best_of(
+            lambda: AbnStatementProcessor.parse_file(tsv_path), args.repeat
+        )
+
+    before_seconds = _best_of(lambda: _encode_with_map_elements(df), args.repeat)
+    after_seconds = _best_of(lambda: _encode_with_json_encode(df), args.repeat)
+    print(f"rows:                      {len(df)}")
+    print(f"map_elements(json.dumps):  {before_seconds:.4f}s")
+    print(f"struct.json_encode():      {after_seconds:.4f}s")
+    print(f"speedup:                   {before_seconds / after_seconds:.1f}x")
+    print(f"full parse_file:           {parse_seconds:.4f}s")
+
+
+if __name__ == "__main__":
+    main()
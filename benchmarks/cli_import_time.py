@@ -0,0 +1,97 @@
+from pathlib import Path
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CLI_MODULE = "transaction_services.statement_file_processing.statement_file_processors"
+
+# Third-party modules worth tracking individually at startup
+HEAVY_MODULES = ["abnamroparser", "mt940", "pypdf", "polars", "psycopg2", "yaml"]
+
+
+def _measure_import(source_root: Path) -> tuple[float, dict[str, float]]:
+    # -X importtime reports cumulative microseconds per module on stderr
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {CLI_MODULE}"],
+        cwd=source_root,
+        env={
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [str(source_root), os.environ.get("PYTHONPATH")])
+            ),
+        },
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_us = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            cumulative_us[name.strip()] = int(cumulative)
+    heavy_modules = {
+        module: cumulative_us[module] / 1e6
+        for module in HEAVY_MODULES
+        if module in cumulative_us
+    }
+    return cumulative_us[CLI_MODULE] / 1e6, heavy_modules
+
+
+def _benchmark(source_root: Path, repeat: int) -> None:
+    timings = []
+    heavy_modules = {}
+    for _ in range(repeat):
+        total_seconds, heavy_modules = _measure_import(source_root)
+        timings.append(total_seconds)
+    print(f"  median import: {statistics.median(timings) * 1000:8.1f} ms")
+    print(f"  min import:    {min(timings) * 1000:8.1f} ms")
+    for module in HEAVY_MODULES:
+        loaded = heavy_modules.get(module)
+        status = f"{loaded * 1000:8.1f} ms" if loaded is not None else "not imported"
+        print(f"    {module:<16}{status}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure cold-start import time of the statement import CLI"
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--compare-ref",
+        type=str,
+        default=None,
+        help="Git ref to measure as well, checked out into a temporary worktree",
+    )
+    args = parser.parse_args()
+
+    repo_root = Path(__file__).resolve().parent.parent
+    print(f"working tree ({repo_root}):")
+    _benchmark(repo_root, args.repeat)
+
+    if args.compare_ref is not None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            worktree = Path(tmp_dir) / "worktree"
+            subprocess.run(
+                ["git", "worktree", "add", "--detach", str(worktree), args.compare_ref],
+                cwd=repo_root,
+                capture_output=True,
+                check=True,
+            )
+            try:
+                print(f"{args.compare_ref}:")
+                _benchmark(worktree, args.repeat)
+            finally:
+                subprocess.run(
+                    ["git", "worktree", "remove", "--force", str(worktree)],
+                    cwd=repo_root,
+                    check=True,
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from psycopg2 import sql
+import polars as pl
+import psycopg2
+import argparse
+import datetime
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import time
+
+BENCHMARK_SCHEMA = "dashboard_fetch_benchmark"
+BENCHMARK_TABLE = "rows"
+FETCH_CASES = ["pandas_fetchall", "polars_copy"]
+
+# Same column types as the debit transactions the dashboard reads
+CREATE_ROWS_TABLE = """
+    CREATE TABLE {schema}.{table} AS
+    SELECT
+        n AS id,
+        date '2020-01-01' + (n %% 1500) AS tx_date,
+        round((random() * 2000 - 1000)::numeric, 2) AS tx_amount,
+        round((random() * 10000)::numeric, 2) AS end_balance,
+        'Groceries' AS category,
+        'Supermarket ' || (n %% 40)::text AS subcategory,
+        'SEPA Incasso Albert Heijn ' || md5(n::text) AS description,
+        jsonb_build_object('Naam', 'Albert Heijn', 'Kenmerk', md5(n::text)) AS desc_json,
+        n %% 7 = 0 AS recurring
+    FROM generate_series(1, %(rows)s) AS n
+    """
+FETCH_QUERY = "SELECT * FROM {schema}.{table} ORDER BY tx_date DESC, id DESC"
+
+
+def _create_rows_table(postgres_conn_str: str, n_rows: int) -> None:
+    db_conn = psycopg2.connect(postgres_conn_str)
+    try:
+        with db_conn.cursor() as cur:
+            cur.execute(
+                sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(
+                    sql.Identifier(BENCHMARK_SCHEMA)
+                )
+            )
+            cur.execute(
+                sql.SQL("DROP TABLE IF EXISTS {}.{}").format(
+                    sql.Identifier(BENCHMARK_SCHEMA), sql.Identifier(BENCHMARK_TABLE)
+                )
+            )
+            cur.execute(
+                sql.SQL(CREATE_ROWS_TABLE).format(
+                    schema=sql.Identifier(BENCHMARK_SCHEMA),
+                    table=sql.Identifier(BENCHMARK_TABLE),
+                ),
+                {"rows": n_rows},
+            )
+            cur.execute(
+                sql.SQL("ANALYZE {}.{}").format(
+                    sql.Identifier(BENCHMARK_SCHEMA), sql.Identifier(BENCHMARK_TABLE)
+                )
+            )
+        db_conn.commit()
+    finally:
+        db_conn.close()
+
+
+def _drop_benchmark_schema(postgres_conn_str: str) -> None:
+    db_conn = psycopg2.connect(postgres_conn_str)
+    try:
+        with db_conn.cursor() as cur:
+            cur.execute(
+                sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(
+                    sql.Identifier(BENCHMARK_SCHEMA)
+                )
+            )
+        db_conn.commit()
+    finally:
+        db_conn.close()
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_case(case_name: str, n_rows: int, postgres_conn_str: str) -> dict:
+    # Imported here so each fresh process only pays for its own library
+    if case_name == "pandas_fetchall":
+        from transaction_services.ui.query_cache import fetch_pandas_frame as fetch
+    else:
+        from transaction_services.ui.arrow_fetch import fetch_polars_frame as fetch
+
+    result = {
+        "case": case_name,
+        "rows_requested": n_rows,
+        "rss_before_fetch_mb": _peak_rss_mb(),
+    }
+    query = sql.SQL(FETCH_QUERY).format(
+        schema=sql.Identifier(BENCHMARK_SCHEMA), table=sql.Identifier(BENCHMARK_TABLE)
+    )
+    db_conn = psycopg2.connect(postgres_conn_str)
+    try:
+        with db_conn.cursor() as cur:
+            query_text = query.as_string(cur)
+            started = time.perf_counter()
+            frame = fetch(cur, query_text)
+            result["fetch_seconds"] = time.perf_counter() - started
+            result["rows"] = len(frame)
+            if isinstance(frame, pl.DataFrame):
+                result["frame_mb"] = frame.estimated_size("mb")
+                dtypes = frame.schema.items()
+            else:
+                result["frame_mb"] = frame.memory_usage(deep=True).sum() / 1024**2
+                dtypes = frame.dtypes.items()
+            result["dtypes"] = {name: str(dtype) for name, dtype in dtypes}
+        db_conn.rollback()
+    except Exception as e:
+        result["error"] = repr(e)
+    finally:
+        db_conn.close()
+
+    # Each case runs in a fresh process so this is the peak of that case alone
+    result["peak_rss_mb"] = _peak_rss_mb()
+    result["fetch_rss_mb"] = result["peak_rss_mb"] - result["rss_before_fetch_mb"]
+    if result.get("fetch_seconds"):
+        result["rows_per_second"] = result["rows"] / result["fetch_seconds"]
+    return result
+
+
+def _run_case_in_fresh_process(
+    case_name: str, n_rows: int, postgres_conn_str: str
+) -> dict:
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(_run_case, case_name, n_rows, postgres_conn_str).result()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_comparison(results: list[dict]) -> None:
+    by_size: dict[int, dict[str, dict]] = {}
+    for result in results:
+        by_size.setdefault(result["rows_requested"], {})[result["case"]] = result
+    print(f"{'rows':>10}  {'case':<16}{'fetch s':>10}{'fetch MB':>10}{'frame MB':>10}")
+    for n_rows, cases in sorted(by_size.items()):
+        for case_name in FETCH_CASES:
+            result = cases.get(case_name)
+            if result is None or "fetch_seconds" not in result:
+                continue
+            print(
+                f"{n_rows:>10}  {case_name:<16}{result['fetch_seconds']:>10.3f}"
+                f"{result['fetch_rss_mb']:>10.1f}{result['frame_mb']:>10.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark dashboard query fetching, fetchall into pandas against COPY into polars"
+    )
+    parser.add_argument("--cases", nargs="+", choices=FETCH_CASES, default=FETCH_CASES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100_000])
+    parser.add_argument(
+        "--throwaway-postgres-conn-str",
+        type=str,
+        required=True,
+        help=f"Postgres the benchmark rows are created in, schema {BENCHMARK_SCHEMA} is dropped afterwards",
+    )
+    parser.add_argument(
+        "--output", type=Path, default=Path("dashboard_fetch_report.json")
+    )
+    args = parser.parse_args()
+
+    results = []
+    try:
+        for n_rows in args.sizes:
+            _create_rows_table(args.throwaway_postgres_conn_str, n_rows)
+            for case_name in args.cases:
+                result = _run_case_in_fresh_process(
+                    case_name, n_rows, args.throwaway_postgres_conn_str
+                )
+                print(json.dumps(result))
+                results.append(result)
+    finally:
+        _drop_benchmark_schema(args.throwaway_postgres_conn_str)
+
+    report = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    _print_comparison(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from psycopg2 import sql
+from transaction_services.statement_file_processing.lib.abn_statement_processing import (
+    AbnStatementProcessor,
+)
+from transaction_services.statement_file_processing.lib.bunq_statement_processing import (
+    BunqStatementProcessor,
+)
+from transaction_services.statement_file_processing.lib.ics_credit_statement_processing import (
+    IcsCreditStatementProcessor,
+)
+from transaction_services.statement_file_processing.lib.bulk_loader import (
+    STAGING_TABLE,
+    build_copy_payload,
+    bulk_load,
+)
+from transaction_services.config.db_constants import (
+    TX_SCHEMA,
+    DEBIT_TX_TABLE,
+    CREDIT_CRD_TX_TABLE,
+)
+from .statement_generators import generate_abn_tsv, generate_ics_pdf, generate_mt940
+import polars as pl
+import psycopg2
+import argparse
+import datetime
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+
+BENCHMARK_CASES = {
+    "abn": (AbnStatementProcessor, generate_abn_tsv, "synthetic.TAB"),
+    "bunq": (BunqStatementProcessor, generate_mt940, "synthetic.sta"),
+    "ics": (IcsCreditStatementProcessor, generate_ics_pdf, "Statement-synthetic.pdf"),
+}
+
+# Minimal copies of the production tables, only what bulk_load relies on
+BENCHMARK_SCHEMA = [
+    "CREATE SCHEMA IF NOT EXISTS {schema}",
+    """CREATE TABLE IF NOT EXISTS {schema}.{debit_table} (
+        id serial PRIMARY KEY,
+        tx_date date,
+        tx_amount numeric,
+        start_balance numeric,
+        end_balance numeric,
+        account text,
+        currency text,
+        description text,
+        desc_json jsonb,
+        bank text,
+        tx_category integer,
+        remarks text,
+        recurrence text,
+        row_fingerprint uuid UNIQUE
+    )""",
+    """CREATE TABLE IF NOT EXISTS {schema}.{credit_table} (
+        statement_id_in_file bigint,
+        card_number text,
+        statement_file_name text,
+        tx_amount numeric,
+        country_code text,
+        tx_date date,
+        descriptions text[],
+        exchange_rate real,
+        foreign_amount numeric,
+        foreign_currency text,
+        tx_category integer,
+        remarks text,
+        recurrence text,
+        direct_debit_link integer,
+        PRIMARY KEY (statement_file_name, statement_id_in_file)
+    )""",
+]
+
+
+def _ensure_benchmark_schema(cur: psycopg2.extensions.cursor) -> None:
+    for statement in BENCHMARK_SCHEMA:
+        cur.execute(
+            sql.SQL(statement).format(
+                schema=sql.Identifier(TX_SCHEMA),
+                debit_table=sql.Identifier(DEBIT_TX_TABLE),
+                credit_table=sql.Identifier(CREDIT_CRD_TX_TABLE),
+            )
+        )
+
+
+def _rows_per_second(rows: int, seconds: Optional[float]) -> Optional[float]:
+    if not seconds:
+        return None
+    return rows / seconds
+
+
+def _run_case(case_name: str, n_rows: int, postgres_conn_str: Optional[str]) -> dict:
+    processor, generate_statement, file_name = BENCHMARK_CASES[case_name]
+    result = {
+        "case": case_name,
+        "processor": processor.__name__,
+        "rows_requested": n_rows,
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = generate_statement(Path(tmp_dir) / file_name, n_rows)
+        result["file_bytes"] = file_path.stat().st_size
+        try:
+            started = time.perf_counter()
+            data = processor.parse_file(file_path)
+            result["parse_seconds"] = time.perf_counter() - started
+            result["rows"] = len(data)
+
+            started = time.perf_counter()
+            processor.get_update_database_query(
+                file_path, data, sql.Identifier(STAGING_TABLE)
+            )
+            build_copy_payload(data)
+            result["build_seconds"] = time.perf_counter() - started
+
+            if postgres_conn_str is not None:
+                db_conn = psycopg2.connect(postgres_conn_str)
+                try:
+                    with db_conn.cursor() as cur:
+                        _ensure_benchmark_schema(cur)
+                        db_conn.commit()
+                        started = time.perf_counter()
+                        bulk_load(cur, processor, file_path, data)
+                        result["load_seconds"] = time.perf_counter() - started
+                    # Keep the throwaway database identical between runs
+                    db_conn.rollback()
+                finally:
+                    db_conn.close()
+        except Exception as e:
+            result["error"] = repr(e)
+
+    rows = result.get("rows", 0)
+    for stage in ("parse", "build", "load"):
+        result[f"{stage}_rows_per_second"] = _rows_per_second(
+            rows, result.get(f"{stage}_seconds")
+        )
+    # ru_maxrss is in KiB on Linux; each case runs in a fresh process so this
+    # is the peak of that case alone
+    result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+
+def _run_case_in_fresh_process(
+    case_name: str, n_rows: int, postgres_conn_str: Optional[str]
+) -> dict:
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(_run_case, case_name, n_rows, postgres_conn_str).result()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_comparison(results: list[dict], baseline_results: list[dict]) -> None:
+    baseline = {(r["case"], r["rows_requested"]): r for r in baseline_results}
+    print(
+        f"{'case':<6}{'rows':>10}  {'stage':<6}{'baseline r/s':>14}{'r/s':>14}{'change':>9}"
+    )
+    for result in results:
+        baseline_result = baseline.get((result["case"], result["rows_requested"]))
+        if baseline_result is None:
+            continue
+        for stage in ("parse", "build", "load"):
+            old = baseline_result.get(f"{stage}_rows_per_second")
+            new = result.get(f"{stage}_rows_per_second")
+            if not old or not new:
+                continue
+            print(
+                f"{result['case']:<6}{result['rows_requested']:>10}  {stage:<6}"
+                f"{old:>14.0f}{new:>14.0f}{(new / old - 1) * 100:>+8.1f}%"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark statement parsing, query building and DB loading on synthetic statements"
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        choices=sorted(BENCHMARK_CASES),
+        default=["abn", "bunq", "ics"],
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument(
+        "--throwaway-postgres-conn-str",
+        type=str,
+        default=None,
+        help="Postgres used for the load stage; tables are created in it if missing",
+    )
+    parser.add_argument("--output", type=Path, default=Path("benchmark_report.json"))
+    parser.add_argument(
+        "--baseline", type=Path, default=None, help="Earlier report to compare against"
+    )
+    args = parser.parse_args()
+
+    results = []
+    for case_name in args.cases:
+        for n_rows in args.sizes:
+            result = _run_case_in_fresh_process(
+                case_name, n_rows, args.throwaway_postgres_conn_str
+            )
+            print(json.dumps(result))
+            results.append(result)
+
+    report = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            _print_comparison(results, json.load(file)["results"])
+
+
+if __name__ == "__main__":
+    main()
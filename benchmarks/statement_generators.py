@@ -0,0 +1,201 @@
+from pathlib import Path
+import datetime
+import random
+
+_ABN_DESCRIPTION_TEMPLATES = [
+    "/TRTP/SEPA OVERBOEKING/IBAN/NL91ABNA0417164300/BIC/ABNANL2A"
+    "/NAME/Counterparty {i}/REMI/Invoice {i}/EREF/NOTPROVIDED",
+    "/TRTP/SEPA Incasso algemeen doorlopend/CSID/NL00ZZZ000000000000"
+    "/NAME/Utility {i}/MARF/MANDATE{i}/REMI/Monthly bill {i}/IBAN/NL02ABNA0123456789"
+    "/BIC/ABNANL2A/EREF/REF{i}",
+    "BEA, Betaalpas                   Shop {i},PAS123"
+    "                NR:ABCD01, {date:%d.%m.%y}/12:34 AMSTERDAM",
+]
+
+
+def _format_abn_amount(amount_cents: int) -> str:
+    sign = "-" if amount_cents < 0 else ""
+    amount_cents = abs(amount_cents)
+    return f"{sign}{amount_cents // 100},{amount_cents % 100:02d}"
+
+
+def generate_abn_tsv(
+    file_path: Path,
+    n_rows: int,
+    start_date: datetime.date = datetime.date(2020, 1, 1),
+    seed: int = 0,
+) -> Path:
+    # Same tab separated layout as the ABN AMRO .TAB export:
+    # account, currency, date, start balance, end balance, value date, amount, description
+    rng = random.Random(seed)
+    balance_cents = 1_000_000
+    with open(file_path, "w", encoding="utf-8") as file:
+        for i in range(n_rows):
+            tx_date = start_date + datetime.timedelta(days=i // 20)
+            amount_cents = rng.randint(-25_000, 20_000)
+            end_balance_cents = balance_cents + amount_cents
+            description = rng.choice(_ABN_DESCRIPTION_TEMPLATES).format(
+                i=i, date=tx_date
+            )
+            file.write(
+                "\t".join(
+                    [
+                        "123456789",
+                        "EUR",
+                        f"{tx_date:%Y%m%d}",
+                        _format_abn_amount(balance_cents),
+                        _format_abn_amount(end_balance_cents),
+                        f"{tx_date:%Y%m%d}",
+                        _format_abn_amount(amount_cents),
+                        description,
+                    ]
+                )
+                + "\n"
+            )
+            balance_cents = end_balance_cents
+    return file_path
+
+
+def _format_mt940_amount(amount_cents: int) -> str:
+    return f"{abs(amount_cents) // 100},{abs(amount_cents) % 100:02d}"
+
+
+def _mt940_balance(tag: str, balance_date: datetime.date, balance_cents: int) -> str:
+    mark = "C" if balance_cents >= 0 else "D"
+    return f":{tag}:{mark}{balance_date:%y%m%d}EUR{_format_mt940_amount(balance_cents)}"
+
+
+def generate_mt940(
+    file_path: Path,
+    n_rows: int,
+    start_date: datetime.date = datetime.date(2020, 1, 1),
+    seed: int = 0,
+) -> Path:
+    # Single Bunq style statement with one :61:/:86: pair per transaction
+    rng = random.Random(seed)
+    balance_cents = 1_000_000
+    end_date = start_date + datetime.timedelta(days=n_rows // 20)
+    lines = [
+        ":20:BUNQ",
+        ":25:NL12BUNQ0123456789",
+        ":28C:00001/001",
+        _mt940_balance("60F", start_date, balance_cents),
+    ]
+    for i in range(n_rows):
+        tx_date = start_date + datetime.timedelta(days=i // 20)
+        amount_cents = rng.randint(-25_000, 20_000) or 1
+        mark = "C" if amount_cents > 0 else "D"
+        lines.append(
+            f":61:{tx_date:%y%m%d}{tx_date:%m%d}{mark}"
+            f"{_format_mt940_amount(amount_cents)}NTRFNONREF//BUNQREF"
+        )
+        lines.append(f":86:Counterparty {i} NL91ABNA0417164300 Payment {i}")
+        balance_cents += amount_cents
+    lines.append(_mt940_balance("62F", end_date, balance_cents))
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(lines) + "\n")
+    return file_path
+
+
+_DUTCH_MONTHS = [
+    "jan",
+    "feb",
+    "mrt",
+    "apr",
+    "mei",
+    "jun",
+    "jul",
+    "aug",
+    "sep",
+    "okt",
+    "nov",
+    "dec",
+]
+_PDF_LINES_PER_PAGE = 50
+
+
+def _escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _write_text_pdf(file_path: Path, pages: list[list[str]]) -> None:
+    # Bare-bones PDF writer so the generator needs no PDF library: one
+    # Helvetica text stream per page, which pypdf can extract line by line
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page_lines in pages:
+        content = ["BT /F1 9 Tf 11 TL 40 800 Td"]
+        content.extend(f"({_escape_pdf_text(line)}) '" for line in page_lines)
+        content.append("ET")
+        stream = "\n".join(content).encode("latin-1")
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842]"
+            b" /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % page_id for page_id in page_ids),
+        len(page_ids),
+    )
+
+    with open(file_path, "wb") as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for object_id, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (object_id, body))
+        xref_offset = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            file.write(b"%010d 00000 n \n" % offset)
+        file.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref_offset)
+        )
+
+
+def generate_ics_pdf(
+    file_path: Path,
+    n_rows: int,
+    start_date: datetime.date = datetime.date(2020, 1, 1),
+    seed: int = 0,
+) -> Path:
+    # Approximates the ICS credit card statement layout: transaction date,
+    # booking date, description, country, amount and Af/Bij marker per line,
+    # with an occasional foreign currency line underneath
+    rng = random.Random(seed)
+    lines = [
+        "International Card Services",
+        "Uw Card nummer 1234",
+        "Datum transactie Datum verwerking Omschrijving Bedrag in euro's",
+    ]
+    for i in range(n_rows):
+        tx_date = start_date + datetime.timedelta(days=i // 20)
+        booking_date = tx_date + datetime.timedelta(days=1)
+        amount_cents = rng.randint(100, 50_000)
+        lines.append(
+            f"{tx_date.day:02d} {_DUTCH_MONTHS[tx_date.month - 1]} "
+            f"{booking_date.day:02d} {_DUTCH_MONTHS[booking_date.month - 1]} "
+            f"MERCHANT {i} AMSTERDAM NLD "
+            f"{amount_cents // 100},{amount_cents % 100:02d} Af"
+        )
+        if i % 10 == 0:
+            foreign_cents = amount_cents * 111 // 100
+            lines.append(
+                f"{foreign_cents // 100},{foreign_cents % 100:02d} USD "
+                "Wisselkoers 1,11000"
+            )
+    pages = [
+        lines[start : start + _PDF_LINES_PER_PAGE]
+        for start in range(0, len(lines), _PDF_LINES_PER_PAGE)
+    ]
+    _write_text_pdf(file_path, pages)
+    return file_path
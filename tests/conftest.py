@@ -0,0 +1,123 @@
+from pathlib import Path
+from typing import Optional
+from psycopg2 import sql
+from transaction_services.config.db_constants import TX_SCHEMA, DEBIT_TX_TABLE
+import os
+import psycopg2
+import pytest
+import shutil
+import socket
+import subprocess
+
+# Minimal debit table with the old composite unique key, the real schema
+# lives in the PersonalFinanceDatabaseSchema repository
+CREATE_DEBIT_TABLE = """
+    CREATE TABLE {schema}.{table} (
+        id serial PRIMARY KEY,
+        tx_date date NOT NULL,
+        tx_amount numeric,
+        start_balance numeric,
+        end_balance numeric,
+        account text NOT NULL,
+        currency text,
+        description text,
+        desc_json jsonb,
+        bank text,
+        tx_category text,
+        remarks text,
+        recurrence text,
+        UNIQUE (tx_date, tx_amount, start_balance, end_balance, account, currency, description, bank)
+    )
+    """
+
+
+def _postgres_bin_dir() -> Optional[Path]:
+    initdb = shutil.which("initdb")
+    if initdb:
+        return Path(initdb).parent
+    try:
+        bin_dir = subprocess.run(
+            ["pg_config", "--bindir"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return Path(bin_dir) if (Path(bin_dir) / "initdb").exists() else None
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="session")
+def postgres_conn_str(tmp_path_factory):
+    # A given throwaway database wins, otherwise a temporary cluster is
+    # started from the local Postgres binaries for the test session
+    if "THROWAWAY_POSTGRES_CONN_STR" in os.environ:
+        yield os.environ["THROWAWAY_POSTGRES_CONN_STR"]
+        return
+    bin_dir = _postgres_bin_dir()
+    if bin_dir is None:
+        pytest.skip("needs THROWAWAY_POSTGRES_CONN_STR or Postgres server binaries")
+    cluster_dir = tmp_path_factory.mktemp("postgres")
+    data_dir = cluster_dir / "data"
+    subprocess.run(
+        [bin_dir / "initdb", "-D", data_dir, "-U", "postgres", "-A", "trust"],
+        capture_output=True,
+        check=True,
+    )
+    port = _free_port()
+    subprocess.run(
+        [
+            bin_dir / "pg_ctl",
+            "-D",
+            data_dir,
+            "-o",
+            f"-p {port} -k {cluster_dir} -c listen_addresses='' -c fsync=off",
+            "-l",
+            cluster_dir / "postgres.log",
+            "-w",
+            "start",
+        ],
+        capture_output=True,
+        check=True,
+    )
+    try:
+        yield f"host={cluster_dir} port={port} user=postgres dbname=postgres"
+    finally:
+        subprocess.run(
+            [bin_dir / "pg_ctl", "-D", data_dir, "-m", "immediate", "stop"],
+            capture_output=True,
+        )
+
+
+def _drop_tx_schema(db_conn: psycopg2.extensions.connection) -> None:
+    with db_conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(
+                sql.Identifier(TX_SCHEMA)
+            )
+        )
+    db_conn.commit()
+
+
+@pytest.fixture
+def db_conn(postgres_conn_str):
+    # Every test starts from an empty transactions schema holding a debit table
+    db_conn = psycopg2.connect(postgres_conn_str)
+    _drop_tx_schema(db_conn)
+    with db_conn.cursor() as cur:
+        cur.execute(sql.SQL("CREATE SCHEMA {}").format(sql.Identifier(TX_SCHEMA)))
+        cur.execute(
+            sql.SQL(CREATE_DEBIT_TABLE).format(
+                schema=sql.Identifier(TX_SCHEMA), table=sql.Identifier(DEBIT_TX_TABLE)
+            )
+        )
+    db_conn.commit()
+    try:
+        yield db_conn
+    finally:
+        db_conn.rollback()
+        _drop_tx_schema(db_conn)
+        db_conn.close()
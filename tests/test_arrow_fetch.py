@@ -0,0 +1,30 @@
+from decimal import Decimal
+from transaction_services.ui.arrow_fetch import fetch_polars_frame
+import polars as pl
+import psycopg2
+
+
+def test_unconstrained_numeric_keeps_its_values(postgres_conn_str):
+    db_conn = psycopg2.connect(postgres_conn_str)
+    try:
+        with db_conn.cursor() as cur:
+            cur.execute(
+                "CREATE TEMPORARY TABLE amounts (account text, x numeric, y numeric(10, 2))"
+            )
+            cur.execute(
+                "INSERT INTO amounts VALUES"
+                " ('a', 12.345, 1.10), ('a', -0.005, 2.25), ('b', 1000000.1, -3.00)"
+            )
+            frame = fetch_polars_frame(
+                cur,
+                "SELECT account, sum(x) AS x, sum(y) AS y, max(y) AS max_y"
+                " FROM amounts GROUP BY account ORDER BY account",
+            )
+    finally:
+        db_conn.close()
+    assert frame["x"].dtype == pl.Decimal(None, 3)
+    assert frame["max_y"].dtype == pl.Decimal(None, 2)
+    assert frame.rows() == [
+        ("a", Decimal("12.340"), Decimal("3.35"), Decimal("2.25")),
+        ("b", Decimal("1000000.100"), Decimal("-3.00"), Decimal("-3.00")),
+    ]
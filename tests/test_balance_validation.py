@@ -0,0 +1,40 @@
+from decimal import Decimal
+from psycopg2 import sql
+from transaction_services.config.db_constants import TX_SCHEMA, DEBIT_TX_TABLE
+from transaction_services.statement_file_processing.lib.balance_validation import (
+    ensure_balance_breaks_table,
+    ensure_validation_state_table,
+    validate_balance_continuity,
+)
+import datetime
+
+
+def _insert_debit_rows(db_conn, rows: list[tuple]) -> None:
+    with db_conn.cursor() as cur:
+        cur.executemany(
+            sql.SQL(
+                "INSERT INTO {}.{} (account, tx_date, tx_amount, start_balance,"
+                " end_balance) VALUES ('NL01', %s, %s, %s, %s)"
+            ).format(sql.Identifier(TX_SCHEMA), sql.Identifier(DEBIT_TX_TABLE)),
+            [
+                (datetime.date(2024, 1, day), end - start, start, end)
+                for day, start, end in rows
+            ],
+        )
+    db_conn.commit()
+
+
+def test_gap_is_reported_on_every_run_until_the_missing_rows_arrive(db_conn):
+    with db_conn.cursor() as cur:
+        ensure_validation_state_table(cur)
+        ensure_balance_breaks_table(cur)
+    db_conn.commit()
+    _insert_debit_rows(db_conn, [(1, 0, 10), (2, 10, 20), (4, 25, 30)])
+
+    first_run = validate_balance_continuity(db_conn)
+    assert [(b.tx_id, b.kind) for b in first_run] == [(3, "gap")]
+    assert first_run[0].expected_start_balance == Decimal("20")
+    assert validate_balance_continuity(db_conn) == first_run
+
+    _insert_debit_rows(db_conn, [(3, 20, 25)])
+    assert validate_balance_continuity(db_conn) == []
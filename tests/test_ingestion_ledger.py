@@ -0,0 +1,47 @@
+from psycopg2 import sql
+from transaction_services.config.db_constants import TX_SCHEMA, INGESTED_FILES_TABLE
+from transaction_services.statement_file_processing.lib.base_statement_processor import (
+    BaseStatementProcessor,
+)
+from transaction_services.statement_file_processing.lib.bulk_loader import LoadResult
+from transaction_services.statement_file_processing.lib.ingestion_ledger import (
+    compute_file_digest,
+    ensure_ledger_table,
+    get_ledger_time,
+    record_ingested_file,
+)
+from transaction_services.statement_file_processing.statement_file_processors import (
+    is_already_ingested,
+)
+
+
+def test_reingest_only_skips_files_loaded_by_the_same_run(db_conn, tmp_path):
+    file_path = tmp_path / "statement.tab"
+    file_path.write_text("2024-01-31\t12.34\n")
+    file_digest = compute_file_digest(file_path)
+    with db_conn.cursor() as cur:
+        ensure_ledger_table(cur)
+        record_ingested_file(
+            cur, file_digest, BaseStatementProcessor, file_path, LoadResult(1, 1, 0)
+        )
+    db_conn.commit()
+
+    with db_conn.cursor() as cur:
+        reingest_since = get_ledger_time(cur)
+    db_conn.commit()
+    assert is_already_ingested(file_path, file_digest, db_conn)
+    assert not is_already_ingested(file_path, file_digest, db_conn, reingest_since)
+
+    with db_conn.cursor() as cur:
+        record_ingested_file(
+            cur, file_digest, BaseStatementProcessor, file_path, LoadResult(1, 0, 1)
+        )
+    db_conn.commit()
+    assert is_already_ingested(file_path, file_digest, db_conn, reingest_since)
+    with db_conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("SELECT rows_inserted, rows_updated FROM {}.{}").format(
+                sql.Identifier(TX_SCHEMA), sql.Identifier(INGESTED_FILES_TABLE)
+            )
+        )
+        assert cur.fetchall() == [(0, 1)]
@@ -0,0 +1,40 @@
+from transaction_services.statement_file_processing.lib.base_statement_processor import (
+    BaseStatementProcessor,
+)
+from transaction_services.statement_file_processing.lib.ingestion_ledger import (
+    FileDigest,
+)
+from transaction_services.statement_file_processing.lib.parse_cache import ParseCache
+from pathlib import Path
+import polars as pl
+
+
+class _NamedStatementProcessor(BaseStatementProcessor):
+    db_table = "statements"
+    file_name_columns = ["statement_file_name"]
+
+    def parse_file(file_path: Path) -> pl.DataFrame:
+        return pl.DataFrame(
+            {
+                "statement_file_name": [file_path.name] * 2,
+                "statement_id_in_file": [0, 1],
+            }
+        )
+
+    def get_update_database_query(file_path, file_content, staging_table):
+        raise NotImplementedError
+
+
+def test_cached_parse_takes_the_name_of_the_file_looked_up(tmp_path):
+    parse_cache = ParseCache(tmp_path / "cache", max_size_bytes=1024 * 1024)
+    file_digest = FileDigest(sha256="0" * 64, size=1)
+    original = Path("statement-2024-01.pdf")
+    parse_cache.put(
+        _NamedStatementProcessor,
+        file_digest,
+        _NamedStatementProcessor.parse_file(original),
+    )
+
+    renamed = Path("copy of statement-2024-01.pdf")
+    cached = parse_cache.get(_NamedStatementProcessor, file_digest, renamed)
+    assert cached.equals(_NamedStatementProcessor.parse_file(renamed))
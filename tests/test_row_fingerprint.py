@@ -0,0 +1,138 @@
+from decimal import Decimal, ROUND_HALF_UP
+from psycopg2 import sql
+from transaction_services.config.db_constants import TX_SCHEMA, DEBIT_TX_TABLE
+from transaction_services.statement_file_processing.lib.row_fingerprint import (
+    FINGERPRINT_AMOUNT_COLUMNS,
+    FINGERPRINT_COLUMN,
+    FINGERPRINT_DATE_COLUMN,
+    FINGERPRINT_INDEX,
+    FINGERPRINT_TEXT_COLUMNS,
+    _FINGERPRINT_SQL,
+    _rounded_cents,
+    ensure_debit_row_fingerprint,
+    with_row_fingerprint,
+)
+import datetime
+import polars as pl
+import psycopg2
+import pytest
+
+AMOUNTS = [
+    Decimal("-12.345"),
+    Decimal("12.345"),
+    Decimal("0.29"),
+    Decimal("-0.005"),
+    Decimal("0.0049"),
+    Decimal("1.23456"),
+    Decimal("-1.995"),
+    Decimal("1000000.10"),
+    None,
+]
+
+
+def _rows() -> pl.DataFrame:
+    n_rows = len(AMOUNTS)
+    return pl.DataFrame(
+        {
+            FINGERPRINT_DATE_COLUMN: [datetime.date(2024, 1, 31)] * n_rows,
+            "tx_amount": pl.Series(AMOUNTS, dtype=pl.Decimal(38, 5)),
+            "start_balance": pl.Series(
+                list(reversed(AMOUNTS)), dtype=pl.Decimal(38, 5)
+            ),
+            "end_balance": pl.Series(
+                [Decimal("10.00")] * n_rows, dtype=pl.Decimal(38, 2)
+            ),
+            "account": ["NL01ABNA0123456789"] * n_rows,
+            "currency": ["EUR"] * (n_rows - 1) + [None],
+            "description": [f"row {i}" for i in range(n_rows)],
+            "bank": ["abn_current"] * n_rows,
+        }
+    )
+
+
+@pytest.mark.parametrize("scale", [0, 2, 3, 5])
+def test_rounded_cents_round_half_away_from_zero_like_postgres(scale):
+    amounts = pl.Series(AMOUNTS, dtype=pl.Decimal(38, scale))
+    cents = pl.DataFrame({"amount": amounts}).select(_rounded_cents("amount", scale))
+    expected = [
+        None if amount is None else int((amount * 100).quantize(1, ROUND_HALF_UP))
+        for amount in amounts
+    ]
+    assert cents.to_series().to_list() == expected
+
+
+def test_parsed_fingerprint_matches_sql_backfill(postgres_conn_str):
+    rows = _rows()
+    columns = [FINGERPRINT_DATE_COLUMN] + FINGERPRINT_AMOUNT_COLUMNS
+    columns += FINGERPRINT_TEXT_COLUMNS
+    db_conn = psycopg2.connect(postgres_conn_str)
+    try:
+        with db_conn.cursor() as cur:
+            cur.execute(
+                sql.SQL(
+                    "SELECT {fingerprint}::text FROM unnest("
+                    "%s::date[], %s::numeric[], %s::numeric[], %s::numeric[],"
+                    " %s::text[], %s::text[], %s::text[], %s::text[]"
+                    ") WITH ORDINALITY AS t ({columns}, ordinality) ORDER BY ordinality"
+                ).format(
+                    fingerprint=_FINGERPRINT_SQL,
+                    columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+                ),
+                [rows[column].to_list() for column in columns],
+            )
+            backfilled = [fingerprint for (fingerprint,) in cur.fetchall()]
+    finally:
+        db_conn.close()
+    assert with_row_fingerprint(rows)[FINGERPRINT_COLUMN].to_list() == [
+        fingerprint.replace("-", "") for fingerprint in backfilled
+    ]
+
+
+def _insert_debit_rows(cur, rows: pl.DataFrame) -> None:
+    cur.executemany(
+        sql.SQL("INSERT INTO {schema}.{table} ({columns}) VALUES ({values})").format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(DEBIT_TX_TABLE),
+            columns=sql.SQL(", ").join(map(sql.Identifier, rows.columns)),
+            values=sql.SQL(", ").join(sql.Placeholder() * len(rows.columns)),
+        ),
+        rows.rows(),
+    )
+
+
+def _stored_fingerprints(cur) -> list[str]:
+    cur.execute(
+        sql.SQL("SELECT {column}::text FROM {schema}.{table} ORDER BY id").format(
+            column=sql.Identifier(FINGERPRINT_COLUMN),
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(DEBIT_TX_TABLE),
+        )
+    )
+    return [fingerprint.replace("-", "") for (fingerprint,) in cur.fetchall()]
+
+
+def test_migration_backfills_parsed_fingerprints_and_salts_null_duplicates(db_conn):
+    rows = _rows()
+    # The last row has a NULL currency, so the composite key let it in twice
+    null_duplicate = rows.tail(1)
+    parsed = with_row_fingerprint(rows)[FINGERPRINT_COLUMN].to_list()
+    with db_conn.cursor() as cur:
+        _insert_debit_rows(cur, pl.concat([rows, null_duplicate]))
+        ensure_debit_row_fingerprint(cur)
+        fingerprints = _stored_fingerprints(cur)
+        assert fingerprints[: len(rows)] == parsed
+        assert fingerprints[-1] not in parsed
+
+        # Running it again only backfills rows that arrived without one, and
+        # one clashing with a stored fingerprint is salted as well
+        _insert_debit_rows(cur, null_duplicate)
+        ensure_debit_row_fingerprint(cur)
+        assert _stored_fingerprints(cur)[: len(fingerprints)] == fingerprints
+        assert len(set(_stored_fingerprints(cur))) == len(rows) + 2
+
+        cur.execute(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = %s AND tablename = %s",
+            (TX_SCHEMA, DEBIT_TX_TABLE),
+        )
+        indexes = {index_name for (index_name,) in cur.fetchall()}
+    assert indexes == {f"{DEBIT_TX_TABLE}_pkey", FINGERPRINT_INDEX}
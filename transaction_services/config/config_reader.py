@@ -1,6 +1,7 @@
 import yaml
 from pathlib import Path
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -12,9 +13,11 @@ class StmtInputFileConfig:
 @dataclass(frozen=True)
 class Config:
     postgres_conn_str: str
-    abn_stmt_input: StmtInputFileConfig
-    credit_card_stmt_input: StmtInputFileConfig
-    bunq_stmt_input: StmtInputFileConfig
+    abn_stmt_input: Optional[StmtInputFileConfig]
+    credit_card_stmt_input: Optional[StmtInputFileConfig]
+    bunq_stmt_input: Optional[StmtInputFileConfig]
+    # Every statement_services entry by config key, including plugin ones
+    stmt_inputs: dict[str, StmtInputFileConfig]
 
 
 def _get_postgres_conn_str(postgres_conf: dict) -> str:
@@ -43,15 +46,16 @@ def get_config(config_file: Path) -> Config:
     parsed_yaml = None
     with open(config_file) as file:
         parsed_yaml = dict(yaml.safe_load(file))
+    stmt_inputs = {
+        name: _get_stmt_input_file_config(stmt_input_file_config_dict)
+        for name, stmt_input_file_config_dict in parsed_yaml[
+            "statement_services"
+        ].items()
+    }
     return Config(
         postgres_conn_str=_get_postgres_conn_str(postgres_conf=parsed_yaml["postgres"]),
-        abn_stmt_input=_get_stmt_input_file_config(
-            parsed_yaml["statement_services"]["abn_debit_stmt"]
-        ),
-        credit_card_stmt_input=_get_stmt_input_file_config(
-            parsed_yaml["statement_services"]["credit_card_stmt"]
-        ),
-        bunq_stmt_input=_get_stmt_input_file_config(
-            parsed_yaml["statement_services"]["bunq_stmt"]
-        ),
+        abn_stmt_input=stmt_inputs.get("abn_debit_stmt"),
+        credit_card_stmt_input=stmt_inputs.get("credit_card_stmt"),
+        bunq_stmt_input=stmt_inputs.get("bunq_stmt"),
+        stmt_inputs=stmt_inputs,
     )
@@ -0,0 +1,81 @@
+from psycopg2 import sql
+from typing import Iterable
+import psycopg2
+import re
+from transaction_services.config.db_constants import (
+    TX_SCHEMA,
+    TX_CATEGORY_TABLE,
+    DEBIT_TX_TABLE,
+    CREDIT_CRD_TX_TABLE,
+    MANUAL_TX_TABLE,
+    LOAN_TABLE,
+    MONTHLY_CATEGORY_TOTALS_TABLE,
+    DATA_VERSIONS_TABLE,
+)
+
+# Tables read by the dashboard; every write to one of them bumps its
+# counter so cached query results that read it are refetched
+VERSIONED_TABLES = [
+    TX_CATEGORY_TABLE,
+    DEBIT_TX_TABLE,
+    CREDIT_CRD_TX_TABLE,
+    MANUAL_TX_TABLE,
+    LOAN_TABLE,
+    MONTHLY_CATEGORY_TOTALS_TABLE,
+]
+
+_TABLE_PATTERNS = {
+    table: re.compile(rf"\b{re.escape(TX_SCHEMA)}\.{re.escape(table)}\b")
+    for table in VERSIONED_TABLES
+}
+
+
+def tables_in_query(query: str) -> list[str]:
+    return [
+        table for table, pattern in _TABLE_PATTERNS.items() if pattern.search(query)
+    ]
+
+
+def ensure_data_versions_table(cur: psycopg2.extensions.cursor) -> None:
+    cur.execute(
+        sql.SQL("""CREATE TABLE IF NOT EXISTS {schema}.{table} (
+                table_name text PRIMARY KEY,
+                version bigint NOT NULL
+            )""").format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(DATA_VERSIONS_TABLE),
+        )
+    )
+
+
+def get_data_versions(cur: psycopg2.extensions.cursor) -> dict[str, int]:
+    cur.execute(
+        sql.SQL("SELECT table_name, version FROM {schema}.{table}").format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(DATA_VERSIONS_TABLE),
+        )
+    )
+    return dict(cur.fetchall())
+
+
+def bump_data_versions(
+    cur: psycopg2.extensions.cursor, tables: Iterable[str]
+) -> dict[str, int]:
+    # Must run in the writing transaction so the new version becomes
+    # visible together with the data it describes
+    tables = sorted(set(tables))
+    if not tables:
+        return {}
+    cur.execute(
+        sql.SQL(
+            "INSERT INTO {schema}.{table} AS dv (table_name, version)"
+            " SELECT unnest(%s::text[]), 1"
+            " ON CONFLICT (table_name) DO UPDATE SET version = dv.version + 1"
+            " RETURNING table_name, version"
+        ).format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(DATA_VERSIONS_TABLE),
+        ),
+        (tables,),
+    )
+    return dict(cur.fetchall())
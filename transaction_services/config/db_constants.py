@@ -4,3 +4,11 @@ DEBIT_TX_TABLE = "debit_transactions"
 CREDIT_CRD_TX_TABLE = "credit_card_transactions"
 MANUAL_TX_TABLE = "manual_transactions"
 LOAN_TABLE = "loans"
+INGESTED_FILES_TABLE = "ingested_files"
+TX_CHANGE_LOG_TABLE = "statement_row_changes"
+BALANCE_VALIDATION_STATE_TABLE = "balance_validation_state"
+BALANCE_BREAKS_TABLE = "balance_breaks"
+INGESTION_JOBS_TABLE = "ingestion_jobs"
+DATA_VERSIONS_TABLE = "data_versions"
+MONTHLY_CATEGORY_TOTALS_TABLE = "monthly_category_totals"
+DIRTY_TOTALS_MONTHS_TABLE = "monthly_category_totals_dirty"
@@ -0,0 +1,417 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional
+from psycopg2 import sql
+import datetime
+import psycopg2
+from transaction_services.config.db_constants import (
+    TX_SCHEMA,
+    TX_CATEGORY_TABLE,
+    DEBIT_TX_TABLE,
+    CREDIT_CRD_TX_TABLE,
+    MANUAL_TX_TABLE,
+    LOAN_TABLE,
+    MONTHLY_CATEGORY_TOTALS_TABLE,
+    DIRTY_TOTALS_MONTHS_TABLE,
+)
+
+# Spending rows of the Expenditure Graph between %(start_date)s and
+# %(end_date)s, after loan and manual corrections and without credit card
+# rows already covered by a direct debit. Corrections count in the month of
+# the debit row they correct, whatever their own date, so every row depends
+# on its own date only and monthly sums add up to any longer range.
+EXPENDITURE_ROWS_QUERY = f"""
+    with debit_ids_in_range as(
+        select dt.id
+        FROM {TX_SCHEMA}.{DEBIT_TX_TABLE} dt
+        where dt.tx_date >= %(start_date)s AND dt.tx_date <= %(end_date)s
+    ),
+    loan_corrections as(
+        select l.debit_tx_reference, sum(l.tx_amount_borrowed) as tx_amount_borrowed
+        FROM {TX_SCHEMA}.{LOAN_TABLE} l
+        where l.debit_tx_reference IN (SELECT id FROM debit_ids_in_range)
+        group by l.debit_tx_reference
+    ),
+    manual_corrections as(
+    select mtx.correcting_debit_tx_ref
+    FROM {TX_SCHEMA}.{MANUAL_TX_TABLE} mtx
+    where mtx.correcting_debit_tx_ref IN (SELECT id FROM debit_ids_in_range)
+    ),
+    credit_tx as(
+        select 'credit' as source, 
+        cdt.tx_amount as tx_amount,
+        cdt.tx_category as tx_category_id,
+        cdt.remarks as remarks,
+        cdt.descriptions::text as descripton,
+        cdt.tx_date as tx_date,
+        cdt.statement_file_name || ', ' || cdt.statement_id_in_file::text as id
+    from
+        {TX_SCHEMA}.{CREDIT_CRD_TX_TABLE} cdt
+    where
+        cdt.direct_debit_link is null
+    AND cdt.tx_date >= %(start_date)s AND cdt.tx_date <= %(end_date)s
+    ),
+    debit_tx as(
+        select 
+        'debit:' || dt.bank as source, 
+        dt.tx_amount + COALESCE(-lc.tx_amount_borrowed,0) as tx_amount,
+        dt.tx_category as tx_category_id,
+        dt.remarks as remarks,
+        CASE WHEN dt.bank = 'abn_current' THEN dt.desc_json::text ELSE dt.description END AS description,
+        dt.tx_date as tx_date,
+        dt.id::text as id
+    FROM
+        {TX_SCHEMA}.{DEBIT_TX_TABLE} dt
+    LEFT JOIN loan_corrections lc ON
+        dt.id = lc.debit_tx_reference
+     WHERE
+        NOT EXISTS (
+            SELECT 1
+            FROM {TX_SCHEMA}.{CREDIT_CRD_TX_TABLE} cdt
+            WHERE cdt.direct_debit_link = dt.id
+            )
+        and
+        NOT EXISTS (
+            SELECT 1
+            FROM manual_corrections mc
+            WHERE mc.correcting_debit_tx_ref = dt.id  
+            )
+    AND dt.tx_date >= %(start_date)s AND dt.tx_date <= %(end_date)s
+    ),
+    manual_tx as(
+        select 'manual' as source, 
+        mdt.tx_amount as tx_amount,
+        mdt.tx_category as tx_category_id,
+        mdt.remarks as remarks,
+        mdt.description as description,
+        mdt.tx_date as tx_date,
+        mdt.id::text as id
+    from
+        {TX_SCHEMA}.{MANUAL_TX_TABLE} mdt
+    WHERE
+      mdt.tx_date >= %(start_date)s AND mdt.tx_date <= %(end_date)s
+    ),
+    all_tx as(
+        SELECT * FROM debit_tx
+        UNION ALL
+        SELECT * FROM credit_tx
+        UNION ALL
+        SELECT * FROM manual_tx
+    ), 
+    all_tx_with_category as(
+        SELECT
+            at.tx_amount,
+            at.source,
+            at.id,
+            coalesce(tc.category, 'na') AS category,
+            coalesce(tc.subcategory, 'na') AS subcategory,
+            at.remarks,
+            at.description,
+            at.tx_date
+        FROM
+            all_tx at
+        LEFT JOIN
+            {TX_SCHEMA}.{TX_CATEGORY_TABLE} tc ON at.tx_category_id = tc.id
+    )
+    SELECT 
+        -atxc.tx_amount as tx_amount,
+        atxc.source,
+        atxc.id,
+        atxc.category,
+        atxc.subcategory,
+        atxc.remarks,
+        atxc.description,
+        atxc.tx_date
+    FROM
+        all_tx_with_category atxc
+    WHERE
+        atxc.category NOT IN ('Foreign Transfer')
+    ORDER BY atxc.tx_amount, atxc.tx_date desc
+    """
+
+# Stored as the totals table comment; changing EXPENDITURE_ROWS_QUERY needs a
+# new value so existing aggregates are recomputed on the next start
+TOTALS_DEFINITION = "expenditure rows v2, corrections in the debit month"
+
+_MARK_DIRTY_FUNCTION = "mark_category_totals_dirty"
+_CHANGED_MONTHS_FUNCTION = "category_totals_changed_months"
+
+# Tables whose rows feed EXPENDITURE_ROWS_QUERY. Statement triggers on them
+# record the months a write touched, including the month of the debit row a
+# credit card, loan or manual row links to.
+_SOURCE_TABLES = [DEBIT_TX_TABLE, CREDIT_CRD_TX_TABLE, MANUAL_TX_TABLE, LOAN_TABLE]
+
+
+def _table_args() -> dict:
+    return dict(
+        schema=sql.Identifier(TX_SCHEMA),
+        totals=sql.Identifier(MONTHLY_CATEGORY_TOTALS_TABLE),
+        dirty=sql.Identifier(DIRTY_TOTALS_MONTHS_TABLE),
+        debit=sql.Identifier(DEBIT_TX_TABLE),
+        categories=sql.Literal(TX_CATEGORY_TABLE),
+        function=sql.Identifier(_MARK_DIRTY_FUNCTION),
+        months_function=sql.Identifier(_CHANGED_MONTHS_FUNCTION),
+    )
+
+
+def _create_mark_dirty_functions(cur: psycopg2.extensions.cursor) -> None:
+    # Rows are read through to_jsonb so one function serves every table;
+    # columns a table does not have simply yield NULL
+    cur.execute(
+        sql.SQL(
+            """CREATE OR REPLACE FUNCTION {schema}.{months_function}(changed jsonb[])
+            RETURNS SETOF date LANGUAGE sql STABLE AS $$
+                SELECT DISTINCT date_trunc('month', changed_dates.tx_date)::date
+                FROM (
+                    SELECT (row_data ->> 'tx_date')::date FROM unnest(changed) AS row_data
+                    UNION ALL
+                    SELECT dt.tx_date
+                    FROM unnest(changed) AS row_data
+                    JOIN {schema}.{debit} dt ON dt.id = coalesce(
+                        row_data ->> 'direct_debit_link',
+                        row_data ->> 'debit_tx_reference',
+                        row_data ->> 'correcting_debit_tx_ref'
+                    )::bigint
+                ) AS changed_dates (tx_date)
+                WHERE changed_dates.tx_date IS NOT NULL
+            $$"""
+        ).format(**_table_args())
+    )
+    # Renaming or deleting a category can change any month
+    cur.execute(
+        sql.SQL("""CREATE OR REPLACE FUNCTION {schema}.{function}() RETURNS trigger
+            LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_TABLE_NAME = {categories} THEN
+                    INSERT INTO {schema}.{dirty} (month)
+                    SELECT DISTINCT month FROM {schema}.{totals}
+                    ON CONFLICT (month) DO NOTHING;
+                    RETURN NULL;
+                END IF;
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    INSERT INTO {schema}.{dirty} (month)
+                    SELECT * FROM {schema}.{months_function}(
+                        ARRAY(SELECT to_jsonb(o) FROM old_rows o)
+                    )
+                    ON CONFLICT (month) DO NOTHING;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {schema}.{dirty} (month)
+                    SELECT * FROM {schema}.{months_function}(
+                        ARRAY(SELECT to_jsonb(n) FROM new_rows n)
+                    )
+                    ON CONFLICT (month) DO NOTHING;
+                END IF;
+                RETURN NULL;
+            END
+            $$""").format(**_table_args())
+    )
+
+
+def _create_triggers(cur: psycopg2.extensions.cursor, table: str) -> None:
+    # Statement triggers with transition tables keep bulk loads to one
+    # trigger call per statement; transition tables need one trigger per event
+    referencing = {
+        "INSERT": "REFERENCING NEW TABLE AS new_rows",
+        "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+        "DELETE": "REFERENCING OLD TABLE AS old_rows",
+    }
+    if table == TX_CATEGORY_TABLE:
+        referencing = {"UPDATE": "", "DELETE": ""}
+    for event, transition_tables in referencing.items():
+        trigger_name = f"{table}_{event.lower()}_category_totals"
+        # Recreating an existing trigger would lock the table on every start
+        cur.execute(
+            "SELECT 1 FROM pg_trigger WHERE tgrelid = %s::regclass AND tgname = %s",
+            (f"{TX_SCHEMA}.{table}", trigger_name),
+        )
+        if cur.fetchone() is not None:
+            continue
+        cur.execute(
+            sql.SQL(
+                "CREATE TRIGGER {trigger} AFTER {event} ON {schema}.{table}"
+                " {transition_tables} FOR EACH STATEMENT"
+                " EXECUTE FUNCTION {schema}.{function}()"
+            ).format(
+                trigger=sql.Identifier(trigger_name),
+                event=sql.SQL(event),
+                schema=sql.Identifier(TX_SCHEMA),
+                table=sql.Identifier(table),
+                transition_tables=sql.SQL(transition_tables),
+                function=sql.Identifier(_MARK_DIRTY_FUNCTION),
+            )
+        )
+
+
+def ensure_monthly_category_totals(cur: psycopg2.extensions.cursor) -> None:
+    cur.execute(
+        "SELECT to_regclass(%s)", (f"{TX_SCHEMA}.{MONTHLY_CATEGORY_TOTALS_TABLE}",)
+    )
+    (existing_table,) = cur.fetchone()
+    cur.execute(sql.SQL("""CREATE TABLE IF NOT EXISTS {schema}.{totals} (
+                month date NOT NULL,
+                category text NOT NULL,
+                subcategory text NOT NULL,
+                tx_amount numeric NOT NULL,
+                tx_count integer NOT NULL,
+                PRIMARY KEY (month, category, subcategory)
+            )""").format(**_table_args()))
+    cur.execute(
+        sql.SQL(
+            "CREATE TABLE IF NOT EXISTS {schema}.{dirty} (month date PRIMARY KEY)"
+        ).format(**_table_args())
+    )
+    _create_mark_dirty_functions(cur)
+    for table in _SOURCE_TABLES + [TX_CATEGORY_TABLE]:
+        _create_triggers(cur, table)
+    cur.execute(
+        "SELECT obj_description(%s::regclass, 'pg_class')",
+        (f"{TX_SCHEMA}.{MONTHLY_CATEGORY_TOTALS_TABLE}",),
+    )
+    (definition,) = cur.fetchone()
+    if existing_table is None or definition != TOTALS_DEFINITION:
+        # First run, or aggregated with an older query: every month with data
+        # still has to be aggregated
+        cur.execute(
+            sql.SQL(
+                "INSERT INTO {schema}.{dirty} (month)"
+                " SELECT DISTINCT date_trunc('month', tx_date)::date FROM ({sources}) AS source_dates"
+                " ON CONFLICT (month) DO NOTHING"
+            ).format(
+                sources=sql.SQL(" UNION ").join(
+                    [
+                        sql.SQL(
+                            "SELECT month AS tx_date FROM {schema}.{totals}"
+                        ).format(**_table_args())
+                    ]
+                    + [
+                        sql.SQL("SELECT tx_date FROM {schema}.{table}").format(
+                            schema=sql.Identifier(TX_SCHEMA),
+                            table=sql.Identifier(table),
+                        )
+                        for table in _SOURCE_TABLES
+                    ]
+                ),
+                **_table_args(),
+            )
+        )
+        cur.execute(
+            sql.SQL("COMMENT ON TABLE {schema}.{totals} IS {definition}").format(
+                definition=sql.Literal(TOTALS_DEFINITION), **_table_args()
+            )
+        )
+
+
+def _month_end(month: datetime.date) -> datetime.date:
+    next_month = (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return next_month - datetime.timedelta(days=1)
+
+
+def refresh_monthly_category_totals(
+    cur: psycopg2.extensions.cursor,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+) -> list[datetime.date]:
+    # Claims the months marked by the triggers and recomputes only those,
+    # limited to the months overlapping [start_date, end_date] when given;
+    # the caller commits, and bumps the totals version if months came back
+    cur.execute(
+        sql.SQL(
+            "DELETE FROM {schema}.{dirty}"
+            " WHERE (%(start_date)s::date IS NULL OR month >= date_trunc('month', %(start_date)s::date))"
+            " AND (%(end_date)s::date IS NULL OR month <= %(end_date)s::date)"
+            " RETURNING month"
+        ).format(**_table_args()),
+        {"start_date": start_date, "end_date": end_date},
+    )
+    months = sorted(month for (month,) in cur.fetchall())
+    if not months:
+        return []
+    cur.execute(
+        sql.SQL("DELETE FROM {schema}.{totals} WHERE month = ANY(%s)").format(
+            **_table_args()
+        ),
+        (months,),
+    )
+    for month in months:
+        cur.execute(
+            sql.SQL(
+                "INSERT INTO {schema}.{totals}"
+                " (month, category, subcategory, tx_amount, tx_count)"
+                " SELECT %(month)s, category, subcategory, coalesce(sum(tx_amount), 0), count(*)"
+                " FROM ({rows}) AS expenditure_rows"
+                " GROUP BY category, subcategory"
+            ).format(rows=sql.SQL(EXPENDITURE_ROWS_QUERY), **_table_args()),
+            {"month": month, "start_date": month, "end_date": _month_end(month)},
+        )
+    return months
+
+
+def get_stale_months(
+    cur: psycopg2.extensions.cursor,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+) -> list[datetime.date]:
+    # Months marked by the triggers that no refresh has picked up yet, read
+    # without claiming them so readers never have to write
+    cur.execute(
+        sql.SQL(
+            "SELECT month FROM {schema}.{dirty}"
+            " WHERE (%(start_date)s::date IS NULL OR month >= date_trunc('month', %(start_date)s::date))"
+            " AND (%(end_date)s::date IS NULL OR month <= %(end_date)s::date)"
+            " ORDER BY month"
+        ).format(**_table_args()),
+        {"start_date": start_date, "end_date": end_date},
+    )
+    return [month for (month,) in cur.fetchall()]
+
+
+@dataclass(frozen=True)
+class CategoryTotalsMismatch:
+    month: datetime.date
+    category: str
+    subcategory: str
+    # None when only one side has the category in that month
+    aggregate_amount: Optional[Decimal]
+    rows_amount: Optional[Decimal]
+
+
+def find_category_totals_mismatches(
+    cur: psycopg2.extensions.cursor,
+    start_date: Optional[datetime.date] = None,
+    end_date: Optional[datetime.date] = None,
+) -> list[CategoryTotalsMismatch]:
+    # Compares the stored months overlapping [start_date, end_date], all of
+    # them by default, with EXPENDITURE_ROWS_QUERY over those whole months;
+    # dirty months should be refreshed first
+    if start_date is None:
+        cur.execute(
+            sql.SQL("SELECT min(month) FROM {schema}.{totals}").format(**_table_args())
+        )
+        (start_date,) = cur.fetchone()
+        if start_date is None:
+            return []
+    if end_date is None:
+        end_date = datetime.date.today()
+    cur.execute(
+        sql.SQL("""WITH aggregate AS (
+                SELECT month, category, subcategory, tx_amount
+                FROM {schema}.{totals}
+                WHERE month >= %(start_date)s AND month <= %(end_date)s
+            ),
+            expenditure AS (
+                SELECT date_trunc('month', tx_date)::date AS month, category, subcategory,
+                    coalesce(sum(tx_amount), 0) AS tx_amount
+                FROM ({rows}) AS expenditure_rows
+                GROUP BY 1, 2, 3
+            )
+            SELECT month, category, subcategory, a.tx_amount, e.tx_amount
+            FROM aggregate a
+            FULL JOIN expenditure e USING (month, category, subcategory)
+            WHERE a.tx_amount IS DISTINCT FROM e.tx_amount
+            ORDER BY month, category, subcategory""").format(
+            rows=sql.SQL(EXPENDITURE_ROWS_QUERY), **_table_args()
+        ),
+        {"start_date": start_date.replace(day=1), "end_date": _month_end(end_date)},
+    )
+    return [CategoryTotalsMismatch(*row) for row in cur.fetchall()]
@@ -1,12 +1,18 @@
 from abnamroparser import tsvparser
 from .base_statement_processor import BaseStatementProcessor
+from .row_fingerprint import FINGERPRINT_COLUMN, with_row_fingerprint
 from psycopg2 import sql
 import polars as pl
-import json
+from pathlib import Path
+from typing import Iterator
+import itertools
+import tempfile
 from transaction_services.config.db_constants import TX_SCHEMA, DEBIT_TX_TABLE
 
 
 class AbnStatementProcessor(BaseStatementProcessor):
+    db_table = DEBIT_TX_TABLE
+    parser_version = 3
     file_to_table_columnn_map = {
         "account": "account",
         "amount": "tx_amount",
@@ -28,7 +34,8 @@ class AbnStatementProcessor(BaseStatementProcessor):
             pl.col("account").cast(pl.String),
             pl.col("currency").cast(pl.String),
             pl.col("description").cast(pl.String),
-            pl.col("desc_json").map_elements(json.dumps, return_dtype=pl.String),
+            # desc is parsed into a struct column, so it is encoded natively
+            pl.col("desc_json").struct.json_encode(),
             pl.lit("abn_current").alias("bank"),
         )
 
@@ -38,21 +45,30 @@ class AbnStatementProcessor(BaseStatementProcessor):
             mapping=AbnStatementProcessor.file_to_table_columnn_map
         )
         df = AbnStatementProcessor._map_dtypes(df)
-        return df
+        return with_row_fingerprint(df)
 
-    def get_update_database_query(file_path, file_content: pl.DataFrame):
+    @classmethod
+    def iter_batches(cls, file_path: Path) -> Iterator[pl.DataFrame]:
+        # The export has one transaction per line and tsvparser only reads
+        # whole files, so it is fed batch_rows lines at a time
+        with open(file_path, "rb") as file, tempfile.TemporaryDirectory() as tmp_dir:
+            chunk_path = Path(tmp_dir) / file_path.name
+            while lines := list(itertools.islice(file, cls.batch_rows)):
+                chunk_path.write_bytes(b"".join(lines))
+                yield cls.parse_file(chunk_path)
+
+    def get_update_database_query(
+        file_path: Path, file_content: pl.DataFrame, staging_table: sql.Identifier
+    ):
         columns = file_content.columns
-        unique_constraint_columns = [c for c in columns if c not in ["desc_json"]]
         query = sql.SQL(
-            "INSERT INTO {schema}.{table} ({columns}) VALUES ("
-            + ",".join(["%s" for i in range(len(columns))])
-            + ") ON CONFLICT ({unique_constraint_columns}) DO NOTHING"
+            "INSERT INTO {schema}.{table} ({columns}) SELECT {columns} FROM {staging_table}"
+            " ON CONFLICT ({fingerprint_column}) DO NOTHING"
         ).format(
             schema=sql.Identifier(TX_SCHEMA),
             table=sql.Identifier(DEBIT_TX_TABLE),
+            staging_table=staging_table,
             columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
-            unique_constraint_columns=sql.SQL(", ").join(
-                map(sql.Identifier, unique_constraint_columns)
-            ),
+            fingerprint_column=sql.Identifier(FINGERPRINT_COLUMN),
         )
         return query
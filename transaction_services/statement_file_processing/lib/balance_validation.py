@@ -0,0 +1,277 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from psycopg2 import sql
+import datetime
+import logging
+import polars as pl
+import psycopg2
+from transaction_services.config.db_constants import (
+    TX_SCHEMA,
+    DEBIT_TX_TABLE,
+    BALANCE_BREAKS_TABLE,
+    BALANCE_VALIDATION_STATE_TABLE,
+)
+
+logger = logging.getLogger(__name__)
+
+MINOR_UNITS_PER_UNIT = 100
+
+_CHAIN_SCHEMA = {
+    "id": pl.Int64,
+    "account": pl.String,
+    "tx_date": pl.Date,
+    "start_balance_minor": pl.Int64,
+    "end_balance_minor": pl.Int64,
+}
+
+
+@dataclass(frozen=True)
+class BalanceBreak:
+    account: str
+    tx_id: int
+    tx_date: datetime.date
+    previous_tx_id: int
+    expected_start_balance: Decimal
+    start_balance: Decimal
+    # "gap" when rows are missing, "overlap" when the chain restarts from a
+    # balance it already reached, i.e. a period was imported twice
+    kind: str
+
+
+def ensure_validation_state_table(cur: psycopg2.extensions.cursor) -> None:
+    cur.execute(
+        sql.SQL("""CREATE TABLE IF NOT EXISTS {schema}.{table} (
+                table_name text PRIMARY KEY,
+                last_validated_id bigint NOT NULL,
+                validated_at timestamptz NOT NULL DEFAULT now()
+            )""").format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(BALANCE_VALIDATION_STATE_TABLE),
+        )
+    )
+
+
+def ensure_balance_breaks_table(cur: psycopg2.extensions.cursor) -> None:
+    # Breaks stay here until a later validation finds the chain continuous
+    # at that row, so they are reported on every run until resolved
+    cur.execute(
+        sql.SQL("""CREATE TABLE IF NOT EXISTS {schema}.{table} (
+                tx_id bigint PRIMARY KEY,
+                account text NOT NULL,
+                tx_date date NOT NULL,
+                previous_tx_id bigint NOT NULL,
+                expected_start_balance numeric NOT NULL,
+                start_balance numeric NOT NULL,
+                kind text NOT NULL,
+                detected_at timestamptz NOT NULL DEFAULT now()
+            )""").format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(BALANCE_BREAKS_TABLE),
+        )
+    )
+
+
+def _last_validated_id(cur: psycopg2.extensions.cursor) -> int:
+    cur.execute(
+        sql.SQL(
+            "SELECT last_validated_id FROM {schema}.{table} WHERE table_name = %s"
+        ).format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(BALANCE_VALIDATION_STATE_TABLE),
+        ),
+        (DEBIT_TX_TABLE,),
+    )
+    row = cur.fetchone()
+    return row[0] if row is not None else 0
+
+
+def _save_last_validated_id(cur: psycopg2.extensions.cursor, last_id: int) -> None:
+    cur.execute(
+        sql.SQL(
+            "INSERT INTO {schema}.{table} (table_name, last_validated_id) VALUES (%s, %s)"
+            " ON CONFLICT (table_name) DO UPDATE SET"
+            " last_validated_id = EXCLUDED.last_validated_id, validated_at = now()"
+        ).format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(BALANCE_VALIDATION_STATE_TABLE),
+        ),
+        (DEBIT_TX_TABLE, last_id),
+    )
+
+
+def _fetch_chain_window(
+    cur: psycopg2.extensions.cursor, last_validated_id: int
+) -> pl.DataFrame:
+    # Rows added since the last run can be older than already validated ones
+    # (a missing statement imported late), so each touched account is
+    # re-read from the earliest new date, anchored on the day before it.
+    # Unresolved breaks are re-read the same way to see if they were fixed.
+    cur.execute(
+        sql.SQL(
+            """WITH changed AS (
+                SELECT account, min(tx_date) AS from_date
+                FROM (
+                    SELECT account, tx_date FROM {schema}.{table}
+                    WHERE id > %(last_validated_id)s
+                    UNION ALL
+                    SELECT account, tx_date FROM {schema}.{breaks_table}
+                ) touched
+                GROUP BY account
+            ), anchors AS (
+                SELECT c.account, coalesce(
+                    (SELECT max(p.tx_date) FROM {schema}.{table} p
+                     WHERE p.account = c.account AND p.tx_date < c.from_date),
+                    c.from_date
+                ) AS anchor_date
+                FROM changed c
+            )
+            SELECT d.id, d.account, d.tx_date,
+                round(d.start_balance * {minor_units})::bigint,
+                round(d.end_balance * {minor_units})::bigint
+            FROM {schema}.{table} d
+            JOIN anchors a ON a.account = d.account AND d.tx_date >= a.anchor_date"""
+        ).format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(DEBIT_TX_TABLE),
+            breaks_table=sql.Identifier(BALANCE_BREAKS_TABLE),
+            minor_units=sql.Literal(MINOR_UNITS_PER_UNIT),
+        ),
+        {"last_validated_id": last_validated_id},
+    )
+    return pl.DataFrame(cur.fetchall(), schema=_CHAIN_SCHEMA, orient="row")
+
+
+def find_balance_breaks(chain: pl.DataFrame) -> pl.DataFrame:
+    ordered = chain.sort("account", "tx_date", "id").with_row_index("position")
+    breaks = ordered.with_columns(
+        pl.col("id").shift(1).over("account").alias("previous_tx_id"),
+        pl.col("end_balance_minor")
+        .shift(1)
+        .over("account")
+        .alias("expected_start_minor"),
+    ).filter(
+        pl.col("previous_tx_id").is_not_null()
+        & (pl.col("start_balance_minor") != pl.col("expected_start_minor"))
+    )
+    reached_balances = ordered.select(
+        pl.col("account"),
+        pl.col("end_balance_minor").alias("start_balance_minor"),
+        pl.col("position").alias("reached_at"),
+    )
+    overlapping_ids = (
+        breaks.join(reached_balances, on=["account", "start_balance_minor"])
+        .filter(pl.col("reached_at") < pl.col("position"))
+        .get_column("id")
+        .unique()
+    )
+    return breaks.with_columns(
+        pl.when(pl.col("id").is_in(overlapping_ids))
+        .then(pl.lit("overlap"))
+        .otherwise(pl.lit("gap"))
+        .alias("kind")
+    )
+
+
+def _checked_tx_ids(chain: pl.DataFrame) -> list[int]:
+    # Rows whose predecessor is part of the window, the first row of each
+    # account is only the anchor
+    return (
+        chain.sort("account", "tx_date", "id")
+        .filter(pl.int_range(pl.len()).over("account") > 0)
+        .get_column("id")
+        .to_list()
+    )
+
+
+def _to_balance(minor_units: int) -> Decimal:
+    return Decimal(minor_units) / MINOR_UNITS_PER_UNIT
+
+
+def _save_balance_breaks(
+    cur: psycopg2.extensions.cursor, checked_ids: list[int], breaks: pl.DataFrame
+) -> None:
+    table_args = dict(
+        schema=sql.Identifier(TX_SCHEMA),
+        breaks_table=sql.Identifier(BALANCE_BREAKS_TABLE),
+        table=sql.Identifier(DEBIT_TX_TABLE),
+    )
+    # Everything checked again is replaced by what this run found, breaks
+    # between rows of which one was deleted since are dropped
+    cur.execute(
+        sql.SQL(
+            """DELETE FROM {schema}.{breaks_table} b
+            WHERE b.tx_id = ANY(%s)
+                OR NOT EXISTS (SELECT 1 FROM {schema}.{table} d WHERE d.id = b.tx_id)
+                OR NOT EXISTS (
+                    SELECT 1 FROM {schema}.{table} d WHERE d.id = b.previous_tx_id
+                )"""
+        ).format(**table_args),
+        (checked_ids,),
+    )
+    cur.executemany(
+        sql.SQL(
+            "INSERT INTO {schema}.{breaks_table} (tx_id, account, tx_date,"
+            " previous_tx_id, expected_start_balance, start_balance, kind)"
+            " VALUES (%s, %s, %s, %s, %s, %s, %s)"
+        ).format(**table_args),
+        [
+            (
+                row["id"],
+                row["account"],
+                row["tx_date"],
+                row["previous_tx_id"],
+                _to_balance(row["expected_start_minor"]),
+                _to_balance(row["start_balance_minor"]),
+                row["kind"],
+            )
+            for row in breaks.iter_rows(named=True)
+        ],
+    )
+
+
+def get_balance_breaks(cur: psycopg2.extensions.cursor) -> list[BalanceBreak]:
+    cur.execute(
+        sql.SQL(
+            "SELECT account, tx_id, tx_date, previous_tx_id, expected_start_balance,"
+            " start_balance, kind FROM {schema}.{breaks_table}"
+            " ORDER BY account, tx_date, tx_id"
+        ).format(
+            schema=sql.Identifier(TX_SCHEMA),
+            breaks_table=sql.Identifier(BALANCE_BREAKS_TABLE),
+        )
+    )
+    return [BalanceBreak(*row) for row in cur.fetchall()]
+
+
+def validate_balance_continuity(
+    db_conn: psycopg2.extensions.connection, from_scratch: bool = False
+) -> list[BalanceBreak]:
+    # Returns every unresolved break, not only the ones found by this run
+    with db_conn.cursor() as cur:
+        last_validated_id = 0 if from_scratch else _last_validated_id(cur)
+        chain = _fetch_chain_window(cur, last_validated_id)
+        if not chain.is_empty():
+            _save_balance_breaks(
+                cur, _checked_tx_ids(chain), find_balance_breaks(chain)
+            )
+            _save_last_validated_id(cur, chain["id"].max())
+        balance_breaks = get_balance_breaks(cur)
+        db_conn.commit()
+
+    for balance_break in balance_breaks:
+        logger.warning(
+            "Balance %s on %s at %s: row %d starts at %s, previous row %d ended at %s",
+            balance_break.kind,
+            balance_break.account,
+            balance_break.tx_date,
+            balance_break.tx_id,
+            balance_break.start_balance,
+            balance_break.previous_tx_id,
+            balance_break.expected_start_balance,
+        )
+    logger.info(
+        "Validated %d debit rows, %d unresolved balance breaks",
+        len(chain),
+        len(balance_breaks),
+    )
+    return balance_breaks
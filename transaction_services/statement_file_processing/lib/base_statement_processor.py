@@ -1,16 +1,39 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
-from psycopg2.sql import SQL
+from typing import Iterator, Optional
+from psycopg2.sql import SQL, Identifier
 import polars as pl
 
 
 class BaseStatementProcessor(ABC):
+    db_table: str
+    # Bump when parse_file output changes so cached parses are invalidated
+    parser_version: int = 1
+    # Rows per frame yielded by iter_batches
+    batch_rows: int = 50_000
+    # Columns parse_file fills with file_path.name; the parse cache is keyed
+    # by content, so it stores them empty and fills in the name on lookup
+    file_name_columns: list[str] = []
+
     @staticmethod
     @abstractmethod
     def parse_file(file_path: Path) -> pl.DataFrame: ...
 
+    @staticmethod
+    def get_change_log_query(
+        file_path: Path, file_content: pl.DataFrame, staging_table: Identifier
+    ) -> Optional[SQL]:
+        # Runs after staging and before the upsert, while old rows are intact
+        return None
+
+    @classmethod
+    def iter_batches(cls, file_path: Path) -> Iterator[pl.DataFrame]:
+        # Processors that can parse incrementally override this; the default
+        # still bounds how much is sent to Postgres at once
+        yield from cls.parse_file(file_path).iter_slices(cls.batch_rows)
+
     @staticmethod
     @abstractmethod
     def get_update_database_query(
-        file_path: Path, file_content: pl.DataFrame
+        file_path: Path, file_content: pl.DataFrame, staging_table: Identifier
     ) -> SQL: ...
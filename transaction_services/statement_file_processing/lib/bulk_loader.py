@@ -0,0 +1,153 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional
+from psycopg2 import sql
+import psycopg2
+import polars as pl
+import io
+from .base_statement_processor import BaseStatementProcessor
+from transaction_services.config.db_constants import TX_SCHEMA
+
+STAGING_TABLE = "stmt_staging"
+COPY_NULL_VALUE = r"\N"
+
+
+@dataclass(frozen=True)
+class LoadResult:
+    rows_in_file: int
+    inserted: int
+    updated: int
+
+    @property
+    def skipped(self) -> int:
+        return self.rows_in_file - self.inserted - self.updated
+
+
+def _pg_array_literal(column: str) -> pl.Expr:
+    # Postgres array text format: {"a","b"} with backslash escaping inside quotes
+    quoted_elements = pl.col(column).list.eval(
+        pl.lit('"')
+        + pl.element()
+        .str.replace_all("\\", "\\\\", literal=True)
+        .str.replace_all('"', '\\"', literal=True)
+        + pl.lit('"')
+    )
+    return pl.concat_str(
+        [pl.lit("{"), quoted_elements.list.join(","), pl.lit("}")]
+    ).alias(column)
+
+
+def _to_copy_compatible(df: pl.DataFrame) -> pl.DataFrame:
+    # CSV writer quotes decimals (turning nulls into the literal "\N") and
+    # cannot write nested types, so both are converted to text up front
+    return df.with_columns(
+        [
+            _pg_array_literal(name)
+            if isinstance(dtype, pl.List)
+            else pl.col(name).cast(pl.String)
+            for name, dtype in df.schema.items()
+            if isinstance(dtype, (pl.List, pl.Decimal))
+        ]
+    )
+
+
+def build_copy_payload(data: pl.DataFrame) -> io.BytesIO:
+    buffer = io.BytesIO()
+    _to_copy_compatible(data).write_csv(
+        buffer, include_header=False, null_value=COPY_NULL_VALUE
+    )
+    buffer.seek(0)
+    return buffer
+
+
+def create_staging_table(
+    cur: psycopg2.extensions.cursor, db_table: str, columns: list[str]
+) -> sql.Identifier:
+    staging_table = sql.Identifier(STAGING_TABLE)
+    cur.execute(
+        sql.SQL("DROP TABLE IF EXISTS {staging_table}").format(
+            staging_table=staging_table
+        )
+    )
+    cur.execute(
+        sql.SQL(
+            "CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS"
+            " SELECT {columns} FROM {schema}.{table} WITH NO DATA"
+        ).format(
+            staging_table=staging_table,
+            columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(db_table),
+        )
+    )
+    return staging_table
+
+
+def copy_to_staging_table(
+    cur: psycopg2.extensions.cursor,
+    staging_table: sql.Identifier,
+    data: pl.DataFrame,
+) -> None:
+    buffer = build_copy_payload(data)
+    copy_query = sql.SQL(
+        "COPY {staging_table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL {null_value})"
+    ).format(
+        staging_table=staging_table,
+        columns=sql.SQL(", ").join(map(sql.Identifier, data.columns)),
+        null_value=sql.Literal(COPY_NULL_VALUE),
+    )
+    cur.copy_expert(copy_query.as_string(cur), buffer)
+
+
+def bulk_load(
+    cur: psycopg2.extensions.cursor,
+    processor: BaseStatementProcessor.__class__,
+    file_path: Path,
+    data: pl.DataFrame,
+) -> LoadResult:
+    return bulk_load_batches(cur, processor, file_path, [data])
+
+
+def bulk_load_batches(
+    cur: psycopg2.extensions.cursor,
+    processor: BaseStatementProcessor.__class__,
+    file_path: Path,
+    batches: Iterable[pl.DataFrame],
+) -> LoadResult:
+    # Every batch is copied into the same staging table and merged with a
+    # single statement, so only one batch is held in memory while the caller
+    # still commits the file as a whole
+    staging_table: Optional[sql.Identifier] = None
+    empty_frame: Optional[pl.DataFrame] = None
+    rows_in_file = 0
+    for batch in batches:
+        if batch.is_empty():
+            continue
+        if staging_table is None:
+            staging_table = create_staging_table(cur, processor.db_table, batch.columns)
+            empty_frame = batch.clear()
+        copy_to_staging_table(cur, staging_table, batch)
+        rows_in_file += len(batch)
+    if staging_table is None:
+        return LoadResult(rows_in_file=0, inserted=0, updated=0)
+
+    change_log_query = processor.get_change_log_query(
+        file_path, empty_frame, staging_table
+    )
+    if change_log_query is not None:
+        cur.execute(change_log_query)
+
+    # xmax is 0 only for freshly inserted tuples, so it separates inserts from
+    # ON CONFLICT DO UPDATE rewrites; DO NOTHING rows are not returned at all
+    merge_query = sql.SQL(
+        "WITH merged AS ({update_query} RETURNING (xmax = 0) AS is_insert)"
+        " SELECT count(*) FILTER (WHERE is_insert), count(*) FILTER (WHERE NOT is_insert)"
+        " FROM merged"
+    ).format(
+        update_query=processor.get_update_database_query(
+            file_path, empty_frame, staging_table
+        )
+    )
+    cur.execute(merge_query)
+    inserted, updated = cur.fetchone()
+    return LoadResult(rows_in_file=rows_in_file, inserted=inserted, updated=updated)
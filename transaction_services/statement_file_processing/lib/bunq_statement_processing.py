@@ -1,88 +1,122 @@
 from .base_statement_processor import BaseStatementProcessor
+from .row_fingerprint import FINGERPRINT_COLUMN, with_row_fingerprint
 from psycopg2 import sql
 import polars as pl
 from pathlib import Path
 import mt940
-import json
 from transaction_services.config.db_constants import TX_SCHEMA, DEBIT_TX_TABLE
 
+MINOR_UNITS_PER_UNIT = 100
+
 
 class BunqStatementProcessor(BaseStatementProcessor):
+    db_table = DEBIT_TX_TABLE
+    parser_version = 3
+
+    # mt940 transaction fields copied into desc_json
+    desc_json_fields = {
+        "status": pl.String,
+        "id": pl.String,
+        "customer_reference": pl.String,
+        "bank_reference": pl.String,
+        "extra_details": pl.String,
+        "currency": pl.String,
+        "date": pl.Date,
+        "guessed_entry_date": pl.Date,
+        "transaction_reference": pl.String,
+    }
+
+    @staticmethod
+    def _to_minor_units(amount_column: str) -> pl.Expr:
+        return (pl.col(amount_column) * MINOR_UNITS_PER_UNIT).cast(pl.Int64)
+
+    @staticmethod
+    def _from_minor_units(minor_units: pl.Expr) -> pl.Expr:
+        return (minor_units.cast(pl.Decimal(38, 0)) / MINOR_UNITS_PER_UNIT).cast(
+            pl.Decimal(38, 2)
+        )
+
     def parse_file(file_path: Path):
-        data_dict = {
-            "tx_date": [],
-            "tx_amount": [],
-            "start_balance": [],
-            "end_balance": [],
-            "account": [],
-            "currency": [],
-            "description": [],
-            "desc_json": [],
-            "bank": [],
-        }
         bunq_data_parsed = mt940.parse(file_path)
+        tx_data = [transaction.data for transaction in bunq_data_parsed.transactions]
 
         account = (
             bunq_data_parsed.data["account_identification"]
             + ":"
             + bunq_data_parsed.data["transaction_reference"]
         )
+        opening_balance = bunq_data_parsed.data["final_opening_balance"].amount.amount
+        closing_balance = bunq_data_parsed.data["final_closing_balance"].amount.amount
 
-        start_balance = bunq_data_parsed.data["final_opening_balance"].amount.amount
-        end_balance = None
-
-        for transaction in bunq_data_parsed.transactions:
-            tx_data = transaction.data
-            tx_amount = tx_data["amount"].amount
-            currency = tx_data["amount"].currency
-            end_balance = start_balance + tx_amount
-            tx_date = tx_data["entry_date"]
-            description = tx_data["transaction_details"]
-            desc_json = {
-                "bank": "Bunq",
-                "status": tx_data["status"],
-                "id": tx_data["id"],
-                "customer_reference": tx_data["customer_reference"],
-                "bank_reference": tx_data["bank_reference"],
-                "extra_details": tx_data["extra_details"],
-                "currency": tx_data["currency"],
-                "date": str(tx_data["date"]),
-                "guessed_entry_date": str(tx_data["guessed_entry_date"]),
-                "transaction_reference": tx_data["transaction_reference"],
-            }
-            data_dict["tx_date"].append(tx_date)
-            data_dict["tx_amount"].append(tx_amount)
-            data_dict["start_balance"].append(start_balance)
-            data_dict["end_balance"].append(end_balance)
-            data_dict["account"].append(account)
-            data_dict["currency"].append(currency)
-            data_dict["description"].append(description)
-            data_dict["desc_json"].append(desc_json)
-            data_dict["bank"].append("bunq")
+        columns = {
+            "tx_date": pl.Series([tx["entry_date"] for tx in tx_data], dtype=pl.Date),
+            "tx_amount": pl.Series(
+                [tx["amount"].amount for tx in tx_data], dtype=pl.Decimal(38, 2)
+            ),
+            "currency": pl.Series(
+                [tx["amount"].currency for tx in tx_data], dtype=pl.String
+            ),
+            "description": pl.Series(
+                [tx["transaction_details"] for tx in tx_data], dtype=pl.String
+            ),
+        }
+        for field, dtype in BunqStatementProcessor.desc_json_fields.items():
+            columns[f"desc_{field}"] = pl.Series(
+                [tx[field] for tx in tx_data], dtype=dtype
+            )
 
-            start_balance = end_balance
+        # Running balances in integer minor units, seeded with the opening balance
+        end_balance_minor = (
+            BunqStatementProcessor._to_minor_units("tx_amount").cum_sum()
+            + int(opening_balance * MINOR_UNITS_PER_UNIT)
+        ).alias("end_balance_minor")
+        df = pl.DataFrame(columns).with_columns(end_balance_minor)
 
-        assert (
-            end_balance == bunq_data_parsed.data["final_closing_balance"].amount.amount
+        final_balance_minor = (
+            df["end_balance_minor"][-1]
+            if len(df) > 0
+            else int(opening_balance * MINOR_UNITS_PER_UNIT)
         )
-        df = pl.DataFrame(data_dict).with_columns(
-            pl.col("desc_json").map_elements(json.dumps, return_dtype=pl.String)
+        assert final_balance_minor == int(closing_balance * MINOR_UNITS_PER_UNIT)
+
+        df = df.select(
+            pl.col("tx_date"),
+            pl.col("tx_amount"),
+            BunqStatementProcessor._from_minor_units(
+                pl.col("end_balance_minor")
+                - BunqStatementProcessor._to_minor_units("tx_amount")
+            ).alias("start_balance"),
+            BunqStatementProcessor._from_minor_units(pl.col("end_balance_minor")).alias(
+                "end_balance"
+            ),
+            pl.lit(account, dtype=pl.String).alias("account"),
+            pl.col("currency"),
+            pl.col("description"),
+            pl.struct(
+                pl.lit("Bunq").alias("bank"),
+                *[
+                    pl.col(f"desc_{field}").cast(pl.String).alias(field)
+                    for field in BunqStatementProcessor.desc_json_fields
+                ],
+            )
+            .struct.json_encode()
+            .alias("desc_json"),
+            pl.lit("bunq").alias("bank"),
         )
-        return df
+        return with_row_fingerprint(df)
 
-    def get_update_database_query(file_path: Path, file_content: pl.DataFrame):
+    def get_update_database_query(
+        file_path: Path, file_content: pl.DataFrame, staging_table: sql.Identifier
+    ):
         columns = file_content.columns
-        unique_constraint_columns = [c for c in columns if c not in ["desc_json"]]
         query = sql.SQL(
-            "INSERT INTO {schema}.{table} ({columns}) VALUES ("
-            + ",".join(["%s" for i in range(len(columns))])
-            + ") ON CONFLICT ({unique_constraint_columns}) DO NOTHING"
+            "INSERT INTO {schema}.{table} ({columns}) SELECT {columns} FROM {staging_table}"
+            " ON CONFLICT ({fingerprint_column}) DO NOTHING"
         ).format(
             schema=sql.Identifier(TX_SCHEMA),
             table=sql.Identifier(DEBIT_TX_TABLE),
+            staging_table=staging_table,
             columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
-            unique_constraint_columns=sql.SQL(", ").join(
-                map(sql.Identifier, unique_constraint_columns)
-            ),
+            fingerprint_column=sql.Identifier(FINGERPRINT_COLUMN),
         )
         return query
@@ -0,0 +1,66 @@
+from psycopg2 import sql
+import psycopg2
+from transaction_services.config.db_constants import (
+    TX_SCHEMA,
+    TX_CHANGE_LOG_TABLE,
+)
+
+
+def ensure_change_log_table(cur: psycopg2.extensions.cursor) -> None:
+    cur.execute(
+        sql.SQL("""CREATE TABLE IF NOT EXISTS {schema}.{table} (
+                id bigserial PRIMARY KEY,
+                table_name text NOT NULL,
+                row_key jsonb NOT NULL,
+                old_values jsonb NOT NULL,
+                new_values jsonb NOT NULL,
+                changed_at timestamptz NOT NULL DEFAULT now()
+            )""").format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(TX_CHANGE_LOG_TABLE),
+        )
+    )
+
+
+def _json_object(alias: str, columns: list[str]) -> sql.Composable:
+    return sql.SQL("jsonb_build_object({})").format(
+        sql.SQL(", ").join(
+            sql.SQL("{}, {}.{}").format(
+                sql.Literal(column), sql.Identifier(alias), sql.Identifier(column)
+            )
+            for column in columns
+        )
+    )
+
+
+def build_change_log_query(
+    table: str,
+    key_columns: list[str],
+    value_columns: list[str],
+    staging_table: sql.Identifier,
+) -> sql.Composed:
+    # Logs staged rows that will overwrite an existing row with different
+    # content, using the same IS DISTINCT FROM test as the upsert itself
+    return sql.SQL(
+        "INSERT INTO {schema}.{change_log_table} (table_name, row_key, old_values, new_values)"
+        " SELECT {table_name}, {row_key}, {old_values}, {new_values}"
+        " FROM {staging_table} AS staged"
+        " JOIN {schema}.{table} AS target USING ({key_columns})"
+        " WHERE ({target_columns}) IS DISTINCT FROM ({staged_columns})"
+    ).format(
+        schema=sql.Identifier(TX_SCHEMA),
+        change_log_table=sql.Identifier(TX_CHANGE_LOG_TABLE),
+        table_name=sql.Literal(table),
+        row_key=_json_object("staged", key_columns),
+        old_values=_json_object("target", value_columns),
+        new_values=_json_object("staged", value_columns),
+        staging_table=staging_table,
+        table=sql.Identifier(table),
+        key_columns=sql.SQL(", ").join(map(sql.Identifier, key_columns)),
+        target_columns=sql.SQL(", ").join(
+            sql.SQL("target.{}").format(sql.Identifier(c)) for c in value_columns
+        ),
+        staged_columns=sql.SQL(", ").join(
+            sql.SQL("staged.{}").format(sql.Identifier(c)) for c in value_columns
+        ),
+    )
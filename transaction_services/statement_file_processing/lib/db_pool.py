@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from typing import Iterator
+from psycopg2 import pool
+import psycopg2
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def rollback_if_open(db_conn: psycopg2.extensions.connection) -> None:
+    # rollback() on a dropped connection raises as well; the pool discards
+    # the connection when it is returned, so the caller carries on
+    if db_conn.closed:
+        return
+    try:
+        db_conn.rollback()
+    except (psycopg2.InterfaceError, psycopg2.OperationalError) as e:
+        logger.warning("Rollback failed on a broken connection: %s", e)
+
+
+class IngestionConnectionPool:
+    def __init__(
+        self,
+        postgres_conn_str: str,
+        max_connections: int = 2,
+        max_backoff_seconds: float = 60.0,
+    ):
+        # minconn=0 so constructing the pool never blocks on an unreachable DB
+        self._pool = pool.ThreadedConnectionPool(0, max_connections, postgres_conn_str)
+        self.max_backoff_seconds = max_backoff_seconds
+
+    @staticmethod
+    def _is_healthy(db_conn: psycopg2.extensions.connection) -> bool:
+        if db_conn.closed:
+            return False
+        try:
+            with db_conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            db_conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _get_healthy_connection(self) -> psycopg2.extensions.connection:
+        backoff_seconds = 1.0
+        while True:
+            try:
+                db_conn = self._pool.getconn()
+            except psycopg2.OperationalError as e:
+                logger.warning(
+                    "Cannot connect to Postgres, retrying in %.0fs: %s",
+                    backoff_seconds,
+                    e,
+                )
+                time.sleep(backoff_seconds)
+                backoff_seconds = min(backoff_seconds * 2, self.max_backoff_seconds)
+                continue
+            if self._is_healthy(db_conn):
+                return db_conn
+            logger.warning("Discarding broken pooled connection")
+            self._pool.putconn(db_conn, close=True)
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg2.extensions.connection]:
+        db_conn = self._get_healthy_connection()
+        try:
+            yield db_conn
+        finally:
+            try:
+                if not db_conn.closed:
+                    db_conn.rollback()
+            except psycopg2.Error:
+                db_conn.close()
+            self._pool.putconn(db_conn, close=bool(db_conn.closed))
+
+    def close(self) -> None:
+        self._pool.closeall()
@@ -0,0 +1,82 @@
+from pathlib import Path
+from typing import Optional
+import datetime
+import gzip
+import logging
+import os
+import shutil
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR_NAME = "archive"
+LEGACY_SUCCESS_SUFFIX = ".success"
+
+
+class FileArchive:
+    # Processed files leave the input directory for <input dir>/archive/YYYY/MM,
+    # so the input directory only ever holds files that still need work
+    def __init__(self, compress: bool = False):
+        self.compress = compress
+
+    def _archive_path(
+        self, file_path: Path, archived_name: str, archived_on: datetime.date
+    ) -> Path:
+        shard_dir = (
+            file_path.parent
+            / ARCHIVE_DIR_NAME
+            / f"{archived_on:%Y}"
+            / f"{archived_on:%m}"
+        )
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        extension = ".gz" if self.compress else ""
+        archive_path = shard_dir / (archived_name + extension)
+        name = Path(archived_name)
+        copy_number = 1
+        # Statement exports reuse names, never overwrite an earlier archive
+        while archive_path.exists():
+            archive_path = shard_dir / (
+                f"{name.stem}_{copy_number}{name.suffix}{extension}"
+            )
+            copy_number += 1
+        return archive_path
+
+    def archive_file(
+        self,
+        file_path: Path,
+        archived_name: Optional[str] = None,
+        archived_on: Optional[datetime.date] = None,
+    ) -> Path:
+        archive_path = self._archive_path(
+            file_path,
+            archived_name or file_path.name,
+            archived_on or datetime.date.today(),
+        )
+        if self.compress:
+            tmp_path = archive_path.with_name(archive_path.name + ".tmp")
+            with open(file_path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            tmp_path.replace(archive_path)
+            file_path.unlink()
+        else:
+            file_path.replace(archive_path)
+        return archive_path
+
+    def archive_legacy_success_files(self, input_dir: Path) -> int:
+        # Files marked processed by the old in-place <name>.success rename
+        archived = 0
+        with os.scandir(input_dir) as entries:
+            legacy_files = [
+                (Path(entry.path), entry.stat().st_mtime)
+                for entry in entries
+                if entry.is_file() and entry.name.endswith(LEGACY_SUCCESS_SUFFIX)
+            ]
+        for file_path, mtime in legacy_files:
+            self.archive_file(
+                file_path,
+                archived_name=file_path.name.removesuffix(LEGACY_SUCCESS_SUFFIX),
+                archived_on=datetime.date.fromtimestamp(mtime),
+            )
+            archived += 1
+        if archived:
+            logger.info("Archived %d processed files in %s", archived, input_dir)
+        return archived
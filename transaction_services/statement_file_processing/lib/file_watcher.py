@@ -0,0 +1,140 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CLOEXEC = 0o2000000
+_INOTIFY_EVENT = struct.Struct("iIII")
+_READ_BUFFER_SIZE = 64 * 1024
+
+
+class BaseFileWatcher(ABC):
+    @abstractmethod
+    def read_changed_paths(self, timeout: Optional[float]) -> set[Path]: ...
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyFileWatcher(BaseFileWatcher):
+    def __init__(self, watch_dirs: list[Path]):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watched_dirs: dict[int, Path] = {}
+        for watch_dir in watch_dirs:
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(watch_dir), _IN_CLOSE_WRITE | _IN_MOVED_TO
+            )
+            if wd < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), f"Cannot watch {watch_dir}")
+            self._watched_dirs[wd] = watch_dir
+
+    def read_changed_paths(self, timeout: Optional[float]) -> set[Path]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        buffer = os.read(self._fd, _READ_BUFFER_SIZE)
+        changed_paths = set()
+        offset = 0
+        while offset < len(buffer):
+            wd, _, _, name_len = _INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += _INOTIFY_EVENT.size
+            name = buffer[offset : offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if wd in self._watched_dirs and name:
+                changed_paths.add(self._watched_dirs[wd] / os.fsdecode(name))
+        return changed_paths
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingFileWatcher(BaseFileWatcher):
+    def __init__(self, watch_dirs: list[Path], poll_interval: float):
+        self._watch_dirs = watch_dirs
+        self._poll_interval = poll_interval
+        self._last_seen = self._scan()
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        seen = {}
+        for watch_dir in self._watch_dirs:
+            with os.scandir(watch_dir) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        seen[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+        return seen
+
+    def read_changed_paths(self, timeout: Optional[float]) -> set[Path]:
+        time.sleep(
+            self._poll_interval if timeout is None else min(timeout, self._poll_interval)
+        )
+        seen = self._scan()
+        changed_paths = {
+            path
+            for path, signature in seen.items()
+            if self._last_seen.get(path) != signature
+        }
+        self._last_seen = seen
+        return changed_paths
+
+
+def create_file_watcher(
+    watch_dirs: list[Path], poll_interval: float
+) -> BaseFileWatcher:
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyFileWatcher(watch_dirs)
+        except (OSError, AttributeError) as e:
+            logger.warning("inotify unavailable, falling back to polling: %s", e)
+    return PollingFileWatcher(watch_dirs, poll_interval)
+
+
+class FileDebouncer:
+    # A file is handed out only once its size and mtime have stayed the same
+    # for settle_seconds, so half-copied statements are not parsed
+    def __init__(self, settle_seconds: float):
+        self.settle_seconds = settle_seconds
+        self._pending: dict[Path, tuple[tuple[int, int], float]] = {}
+
+    def has_pending(self) -> bool:
+        return len(self._pending) > 0
+
+    def touch(self, file_path: Path) -> None:
+        self._pending.pop(file_path, None)
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            return
+        self._pending[file_path] = ((stat.st_size, stat.st_mtime_ns), time.monotonic())
+
+    def pop_settled(self) -> list[Path]:
+        now = time.monotonic()
+        settled = []
+        for file_path, (signature, changed_at) in list(self._pending.items()):
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                del self._pending[file_path]
+                continue
+            current_signature = (stat.st_size, stat.st_mtime_ns)
+            if current_signature != signature:
+                self._pending[file_path] = (current_signature, now)
+            elif now - changed_at >= self.settle_seconds:
+                del self._pending[file_path]
+                settled.append(file_path)
+        return sorted(settled)
@@ -3,10 +3,16 @@ from .base_statement_processor import BaseStatementProcessor
 from psycopg2 import sql
 import polars as pl
 from pathlib import Path
+from typing import Iterator
+from .change_log import build_change_log_query
+import itertools
 from transaction_services.config.db_constants import TX_SCHEMA, CREDIT_CRD_TX_TABLE
 
 
 class IcsCreditStatementProcessor(BaseStatementProcessor):
+    db_table = CREDIT_CRD_TX_TABLE
+    primary_key_columns = ["statement_file_name", "statement_id_in_file"]
+    file_name_columns = ["statement_file_name"]
     file_to_table_columnn_map = {
         "card_number": "card_number",
         "amount": "tx_amount",
@@ -33,11 +39,10 @@ class IcsCreditStatementProcessor(BaseStatementProcessor):
             pl.col("foreign_currency").cast(pl.String),
         )
 
-    def parse_file(file_path: Path):
-        data_as_json = [
-            transaction.as_json_like
-            for transaction in icspdfparser.read_ics_pdf(file_path)
-        ]
+    @staticmethod
+    def _to_frame(
+        data_as_json: list[dict], file_path: Path, first_statement_id: int
+    ) -> pl.DataFrame:
         df = pl.DataFrame(data_as_json).rename(
             mapping=IcsCreditStatementProcessor.file_to_table_columnn_map
         )
@@ -61,30 +66,80 @@ class IcsCreditStatementProcessor(BaseStatementProcessor):
                 pl.lit(file_path.name).alias(
                     "statement_file_name"
                 ),  # Add filename column
-                pl.arange(0, len(df)).alias("statement_id_in_file"),  # Add ID column
+                pl.arange(first_statement_id, first_statement_id + len(df)).alias(
+                    "statement_id_in_file"
+                ),  # Add ID column
             ]
         )
         df = IcsCreditStatementProcessor._map_dtypes(df)
         return df
 
-    def get_update_database_query(file_path: Path, file_content: pl.DataFrame):
+    def parse_file(file_path: Path):
+        data_as_json = [
+            transaction.as_json_like
+            for transaction in icspdfparser.read_ics_pdf(file_path)
+        ]
+        return IcsCreditStatementProcessor._to_frame(data_as_json, file_path, 0)
+
+    @classmethod
+    def iter_batches(cls, file_path: Path) -> Iterator[pl.DataFrame]:
+        transactions = iter(icspdfparser.read_ics_pdf(file_path))
+        first_statement_id = 0
+        while batch := list(itertools.islice(transactions, cls.batch_rows)):
+            yield cls._to_frame(
+                [transaction.as_json_like for transaction in batch],
+                file_path,
+                first_statement_id,
+            )
+            first_statement_id += len(batch)
+
+    def get_change_log_query(
+        file_path: Path, file_content: pl.DataFrame, staging_table: sql.Identifier
+    ):
+        return build_change_log_query(
+            CREDIT_CRD_TX_TABLE,
+            IcsCreditStatementProcessor.primary_key_columns,
+            [
+                c
+                for c in file_content.columns
+                if c not in IcsCreditStatementProcessor.primary_key_columns
+            ],
+            staging_table,
+        )
+
+    def get_update_database_query(
+        file_path: Path, file_content: pl.DataFrame, staging_table: sql.Identifier
+    ):
         columns = file_content.columns
+        replaced_columns = [
+            c
+            for c in columns
+            if c not in IcsCreditStatementProcessor.primary_key_columns
+        ]
+        # Rows whose content is unchanged are left alone, so re-importing a
+        # statement writes no new tuples or WAL for them
         query = sql.SQL(
-            "INSERT INTO {schema}.{table} ({columns}) VALUES ("
-            + ",".join(["%s" for i in range(len(columns))])
-            + ") ON CONFLICT (statement_file_name, statement_id_in_file) DO UPDATE SET {replaced_columns}"
+            "INSERT INTO {schema}.{table} AS target ({columns}) SELECT {columns} FROM {staging_table}"
+            " ON CONFLICT ({primary_key_columns}) DO UPDATE SET {replaced_columns}"
+            " WHERE ({target_columns}) IS DISTINCT FROM ({excluded_columns})"
         ).format(
             schema=sql.Identifier(TX_SCHEMA),
             table=sql.Identifier(CREDIT_CRD_TX_TABLE),
+            staging_table=staging_table,
             columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+            primary_key_columns=sql.SQL(", ").join(
+                map(sql.Identifier, IcsCreditStatementProcessor.primary_key_columns)
+            ),
             replaced_columns=sql.SQL(", ").join(
                 sql.SQL("{} = EXCLUDED.{}").format(sql.Identifier(c), sql.Identifier(c))
-                for c in columns
-                if c
-                not in (
-                    "statement_file_name",
-                    "statement_id_in_file",
-                )  # Exclude primary key
+                for c in replaced_columns
+            ),
+            target_columns=sql.SQL(", ").join(
+                sql.SQL("target.{}").format(sql.Identifier(c)) for c in replaced_columns
+            ),
+            excluded_columns=sql.SQL(", ").join(
+                sql.SQL("EXCLUDED.{}").format(sql.Identifier(c))
+                for c in replaced_columns
             ),
         )
         return query
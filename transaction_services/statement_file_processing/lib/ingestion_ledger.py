@@ -0,0 +1,159 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from psycopg2 import sql
+import psycopg2
+import datetime
+import hashlib
+import json
+import os
+from .base_statement_processor import BaseStatementProcessor
+from .bulk_loader import LoadResult
+from transaction_services.config.db_constants import TX_SCHEMA, INGESTED_FILES_TABLE
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileDigest:
+    sha256: str
+    size: int
+
+
+def compute_file_digest(file_path: Path) -> FileDigest:
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(file_path, "rb") as file:
+        while chunk := file.read(_HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+            size += len(chunk)
+    return FileDigest(sha256=sha256.hexdigest(), size=size)
+
+
+class FileDigestCache:
+    # Digests keyed by (path, mtime, size) so unchanged files are not rehashed
+    def __init__(self, cache_file: Path):
+        self.cache_file = cache_file
+        self._entries: dict[str, dict] = {}
+        self._is_dirty = False
+        if cache_file.exists():
+            with open(cache_file) as file:
+                self._entries = json.load(file)
+
+    def get_digest(self, file_path: Path) -> FileDigest:
+        stat = file_path.stat()
+        key = str(file_path.resolve())
+        entry = self._entries.get(key)
+        if (
+            entry is not None
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            return FileDigest(sha256=entry["sha256"], size=entry["size"])
+        digest = compute_file_digest(file_path)
+        self._entries[key] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": digest.size,
+            "sha256": digest.sha256,
+        }
+        self._is_dirty = True
+        return digest
+
+    def save(self) -> None:
+        if not self._is_dirty:
+            return
+        self._entries = {
+            key: entry for key, entry in self._entries.items() if os.path.exists(key)
+        }
+        tmp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        with open(tmp_file, "w") as file:
+            json.dump(self._entries, file)
+        tmp_file.replace(self.cache_file)
+        self._is_dirty = False
+
+
+def get_file_digest(
+    file_path: Path, digest_cache: Optional[FileDigestCache] = None
+) -> FileDigest:
+    if digest_cache is None:
+        return compute_file_digest(file_path)
+    return digest_cache.get_digest(file_path)
+
+
+def ensure_ledger_table(cur: psycopg2.extensions.cursor) -> None:
+    cur.execute(
+        sql.SQL("""CREATE TABLE IF NOT EXISTS {schema}.{table} (
+                sha256 char(64) PRIMARY KEY,
+                file_size bigint NOT NULL,
+                processor text NOT NULL,
+                file_name text NOT NULL,
+                rows_in_file integer NOT NULL,
+                rows_inserted integer NOT NULL,
+                rows_updated integer NOT NULL,
+                rows_skipped integer NOT NULL,
+                first_ingested_at timestamptz NOT NULL DEFAULT now(),
+                last_ingested_at timestamptz NOT NULL DEFAULT now()
+            )""").format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(INGESTED_FILES_TABLE),
+        )
+    )
+
+
+def get_ledger_time(cur: psycopg2.extensions.cursor) -> datetime.datetime:
+    # Database clock, the one last_ingested_at is stamped with
+    cur.execute("SELECT now()")
+    return cur.fetchone()[0]
+
+
+def is_file_ingested(
+    cur: psycopg2.extensions.cursor,
+    digest: FileDigest,
+    ingested_since: Optional[datetime.datetime] = None,
+) -> bool:
+    # With ingested_since, loads recorded before it are ignored
+    cur.execute(
+        sql.SQL(
+            "SELECT 1 FROM {schema}.{table} WHERE sha256 = %s"
+            " AND (%s::timestamptz IS NULL OR last_ingested_at >= %s)"
+        ).format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(INGESTED_FILES_TABLE),
+        ),
+        (digest.sha256, ingested_since, ingested_since),
+    )
+    return cur.fetchone() is not None
+
+
+def record_ingested_file(
+    cur: psycopg2.extensions.cursor,
+    digest: FileDigest,
+    processor: BaseStatementProcessor.__class__,
+    file_path: Path,
+    load_result: LoadResult,
+) -> None:
+    cur.execute(
+        sql.SQL(
+            "INSERT INTO {schema}.{table} (sha256, file_size, processor, file_name,"
+            " rows_in_file, rows_inserted, rows_updated, rows_skipped)"
+            " VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+            " ON CONFLICT (sha256) DO UPDATE SET file_name = EXCLUDED.file_name,"
+            " rows_in_file = EXCLUDED.rows_in_file,"
+            " rows_inserted = EXCLUDED.rows_inserted,"
+            " rows_updated = EXCLUDED.rows_updated,"
+            " rows_skipped = EXCLUDED.rows_skipped, last_ingested_at = now()"
+        ).format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(INGESTED_FILES_TABLE),
+        ),
+        (
+            digest.sha256,
+            digest.size,
+            processor.__name__,
+            file_path.name,
+            load_result.rows_in_file,
+            load_result.inserted,
+            load_result.updated,
+            load_result.skipped,
+        ),
+    )
@@ -0,0 +1,185 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+from .base_statement_processor import BaseStatementProcessor
+from .bulk_loader import LoadResult
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = "personal_finance_ingestion"
+
+# name -> (type, help)
+METRIC_DEFINITIONS = {
+    "files_total": ("counter", "Statement files handled, by processor and outcome"),
+    "rows_parsed_total": ("counter", "Rows produced by parse_file"),
+    "rows_inserted_total": ("counter", "Rows newly inserted into the database"),
+    "rows_updated_total": ("counter", "Existing rows rewritten by an upsert"),
+    "rows_conflicted_total": ("counter", "Rows skipped by ON CONFLICT"),
+    "bytes_read_total": ("counter", "Statement file bytes read"),
+    "parse_seconds_total": ("counter", "Time spent parsing statement files"),
+    "db_seconds_total": ("counter", "Time spent loading and committing rows"),
+    "cycles_total": ("counter", "Ingestion cycles run by the daemon"),
+    "last_cycle_seconds": ("gauge", "Duration of the last ingestion cycle"),
+    "last_cycle_timestamp_seconds": ("gauge", "Unix time the last cycle finished"),
+}
+
+
+@dataclass
+class FileIngestionMetrics:
+    file_name: str
+    processor: str
+    # failed until a success path says otherwise
+    status: str = "failed"
+    bytes_read: int = 0
+    rows_parsed: int = 0
+    rows_inserted: int = 0
+    rows_updated: int = 0
+    rows_conflicted: int = 0
+    parse_seconds: float = 0.0
+    db_seconds: float = 0.0
+
+    def record_parse(self, rows_parsed: int, parse_seconds: float) -> None:
+        self.rows_parsed = rows_parsed
+        self.parse_seconds = parse_seconds
+
+    def record_load(self, load_result: LoadResult, db_seconds: float) -> None:
+        self.status = "loaded"
+        self.rows_inserted = load_result.inserted
+        self.rows_updated = load_result.updated
+        self.rows_conflicted = load_result.skipped
+        self.db_seconds = db_seconds
+
+
+@dataclass(frozen=True)
+class CycleSummary:
+    files_by_status: dict[str, int]
+    rows_parsed: int
+    seconds: float
+
+    @property
+    def files(self) -> int:
+        return sum(self.files_by_status.values())
+
+    @property
+    def failed(self) -> int:
+        return self.files_by_status.get("failed", 0)
+
+
+class IngestionMetrics:
+    def __init__(self, textfile_path: Optional[Path] = None):
+        self.textfile_path = textfile_path
+        self._values: dict[tuple[str, tuple[tuple[str, str], ...]], float] = (
+            defaultdict(float)
+        )
+        self.start_cycle(0)
+
+    def start_cycle(self, expected_files: int) -> None:
+        self._cycle_expected_files = expected_files
+        self._cycle_started = time.perf_counter()
+        self._cycle_files_by_status: Counter[str] = Counter()
+        self._cycle_rows_parsed = 0
+
+    def _add(self, name: str, value: float, **labels: str) -> None:
+        self._values[(name, tuple(sorted(labels.items())))] += value
+
+    def _set(self, name: str, value: float, **labels: str) -> None:
+        self._values[(name, tuple(sorted(labels.items())))] = value
+
+    @contextmanager
+    def track_file(
+        self, processor: BaseStatementProcessor.__class__, file_path: Path
+    ) -> Iterator[FileIngestionMetrics]:
+        file_metrics = FileIngestionMetrics(
+            file_name=file_path.name, processor=processor.__name__
+        )
+        try:
+            yield file_metrics
+        finally:
+            self.record_file(file_metrics)
+
+    def record_file(self, file_metrics: FileIngestionMetrics) -> None:
+        logger.info("ingestion_metrics %s", json.dumps(asdict(file_metrics)))
+        processor = file_metrics.processor
+        self._add("files_total", 1, processor=processor, status=file_metrics.status)
+        self._add("rows_parsed_total", file_metrics.rows_parsed, processor=processor)
+        self._add(
+            "rows_inserted_total", file_metrics.rows_inserted, processor=processor
+        )
+        self._add("rows_updated_total", file_metrics.rows_updated, processor=processor)
+        self._add(
+            "rows_conflicted_total", file_metrics.rows_conflicted, processor=processor
+        )
+        self._add("bytes_read_total", file_metrics.bytes_read, processor=processor)
+        self._add(
+            "parse_seconds_total", file_metrics.parse_seconds, processor=processor
+        )
+        self._add("db_seconds_total", file_metrics.db_seconds, processor=processor)
+
+        self._cycle_files_by_status[file_metrics.status] += 1
+        self._cycle_rows_parsed += file_metrics.rows_parsed
+        files_done = sum(self._cycle_files_by_status.values())
+        if self._cycle_expected_files > 1:
+            elapsed = time.perf_counter() - self._cycle_started
+            logger.info(
+                "Progress: %d/%d files, %d rows parsed, %.1f files/s",
+                files_done,
+                self._cycle_expected_files,
+                self._cycle_rows_parsed,
+                files_done / elapsed if elapsed else 0.0,
+            )
+
+    def record_cycle(self) -> CycleSummary:
+        summary = CycleSummary(
+            files_by_status=dict(self._cycle_files_by_status),
+            rows_parsed=self._cycle_rows_parsed,
+            seconds=time.perf_counter() - self._cycle_started,
+        )
+        self._add("cycles_total", 1)
+        self._set("last_cycle_seconds", summary.seconds)
+        self._set("last_cycle_timestamp_seconds", time.time())
+        self.write_textfile()
+        if summary.files:
+            logger.info(
+                "Cycle done: %d files (%s), %d rows in %.1fs, %.0f rows/s",
+                summary.files,
+                ", ".join(
+                    f"{count} {status}"
+                    for status, count in sorted(summary.files_by_status.items())
+                ),
+                summary.rows_parsed,
+                summary.seconds,
+                summary.rows_parsed / summary.seconds if summary.seconds else 0.0,
+            )
+        return summary
+
+    def render(self) -> str:
+        lines = []
+        for name, (metric_type, help_text) in METRIC_DEFINITIONS.items():
+            samples = sorted(
+                (labels, value)
+                for (sample_name, labels), value in self._values.items()
+                if sample_name == name
+            )
+            if not samples:
+                continue
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+            for labels, value in samples:
+                label_str = ",".join(f'{key}="{val}"' for key, val in labels)
+                label_str = "{" + label_str + "}" if label_str else ""
+                lines.append(f"{METRIC_PREFIX}_{name}{label_str} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self) -> None:
+        if self.textfile_path is None:
+            return
+        # node-exporter may read at any moment, so the file is swapped in atomically
+        tmp_path = self.textfile_path.with_name(self.textfile_path.name + ".tmp")
+        with open(tmp_path, "w") as file:
+            file.write(self.render())
+        tmp_path.replace(self.textfile_path)
@@ -0,0 +1,65 @@
+from fnmatch import fnmatchcase
+from pathlib import Path
+from .file_archive import ARCHIVE_DIR_NAME
+from .quarantine import QUARANTINE_DIR_NAME
+import os
+import time
+
+# Coarsest directory mtime resolution we expect (FAT/SMB shares use 2s)
+MTIME_GRANULARITY_NS = 2_000_000_000
+
+
+def is_nested_glob(file_glob: str) -> bool:
+    return "**" in file_glob or "/" in file_glob or os.sep in file_glob
+
+
+def _glob_input_dir(input_dir: Path, file_glob: str) -> list[Path]:
+    # Processed and failed files are moved below the input dir, a recursive
+    # glob must not pick them up again
+    return sorted(
+        file_path
+        for file_path in input_dir.glob(file_glob)
+        if not {ARCHIVE_DIR_NAME, QUARANTINE_DIR_NAME}.intersection(
+            file_path.relative_to(input_dir).parts[:-1]
+        )
+        and file_path.is_file()
+    )
+
+
+def scan_input_dir(input_dir: Path, file_glob: str) -> list[Path]:
+    # fnmatch only sees entry names, patterns reaching into subdirectories
+    # need Path.glob
+    if is_nested_glob(file_glob):
+        return _glob_input_dir(input_dir, file_glob)
+    with os.scandir(input_dir) as entries:
+        return sorted(
+            Path(entry.path)
+            for entry in entries
+            if fnmatchcase(entry.name, file_glob) and entry.is_file()
+        )
+
+
+class InputDirScanner:
+    # A directory's mtime only changes when entries are added, removed or
+    # renamed, so once a scan found nothing to do the directory is skipped
+    # until its mtime moves past that watermark. Directories that still hold
+    # candidates (e.g. files that keep failing) are rescanned every cycle.
+    def __init__(self):
+        self._idle_watermarks: dict[tuple[Path, str], int] = {}
+
+    def scan(self, input_dir: Path, file_glob: str) -> list[Path]:
+        # Files added to a subdirectory leave the input dir's mtime alone
+        if is_nested_glob(file_glob):
+            return scan_input_dir(input_dir, file_glob)
+        key = (input_dir, file_glob)
+        dir_mtime_ns = os.stat(input_dir).st_mtime_ns
+        if self._idle_watermarks.get(key) == dir_mtime_ns:
+            return []
+        files = scan_input_dir(input_dir, file_glob)
+        # An mtime inside the granularity window could still change without
+        # its value moving, so only trust it once it is safely in the past
+        if not files and time.time_ns() - dir_mtime_ns > MTIME_GRANULARITY_NS:
+            self._idle_watermarks[key] = dir_mtime_ns
+        else:
+            self._idle_watermarks.pop(key, None)
+        return files
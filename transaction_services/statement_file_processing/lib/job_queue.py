@@ -0,0 +1,173 @@
+from pathlib import Path
+from psycopg2 import sql
+import psycopg2
+import logging
+import os
+import socket
+from transaction_services.config.db_constants import TX_SCHEMA, INGESTION_JOBS_TABLE
+
+logger = logging.getLogger(__name__)
+
+# A file that is still in its input directory after processing (transient
+# failure, or quarantine disabled) becomes claimable again after this delay
+RELEASE_DELAY_SECONDS = 60.0
+
+NamedFiles = list[tuple[str, Path]]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def ensure_job_table(cur: psycopg2.extensions.cursor) -> None:
+    # Files are keyed relative to their input root because every host may
+    # mount the shared input directories at a different path
+    cur.execute(
+        sql.SQL("""CREATE TABLE IF NOT EXISTS {schema}.{table} (
+                queue text NOT NULL,
+                processor text NOT NULL,
+                relative_path text NOT NULL,
+                registered_at timestamptz NOT NULL DEFAULT now(),
+                claimed_by text,
+                claimed_until timestamptz,
+                attempts integer NOT NULL DEFAULT 0,
+                PRIMARY KEY (queue, processor, relative_path)
+            )""").format(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(INGESTION_JOBS_TABLE),
+        )
+    )
+
+
+class IngestionJobQueue:
+    # Scanners register the files they see, workers claim them with
+    # FOR UPDATE SKIP LOCKED. A claim is a lease: when a worker dies its
+    # files become claimable again once claimed_until has passed.
+    def __init__(
+        self,
+        queue: str,
+        input_roots: dict[str, Path],
+        worker_id: str,
+        lease_seconds: float,
+        claim_batch_size: int,
+    ):
+        self.queue = queue
+        self.input_roots = input_roots
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.claim_batch_size = claim_batch_size
+        self._table_args = dict(
+            schema=sql.Identifier(TX_SCHEMA),
+            table=sql.Identifier(INGESTION_JOBS_TABLE),
+        )
+
+    def _job_keys(self, named_files: NamedFiles) -> tuple[list[str], list[str]]:
+        return (
+            [processor_name for processor_name, _ in named_files],
+            [
+                file_path.relative_to(self.input_roots[processor_name]).as_posix()
+                for processor_name, file_path in named_files
+            ],
+        )
+
+    def register_files(
+        self, db_conn: psycopg2.extensions.connection, named_files: NamedFiles
+    ) -> int:
+        if not named_files:
+            return 0
+        processor_names, relative_paths = self._job_keys(named_files)
+        with db_conn.cursor() as cur:
+            cur.execute(
+                sql.SQL(
+                    "INSERT INTO {schema}.{table} (queue, processor, relative_path)"
+                    " SELECT %s, unnest(%s::text[]), unnest(%s::text[])"
+                    " ON CONFLICT (queue, processor, relative_path) DO NOTHING"
+                ).format(**self._table_args),
+                (self.queue, processor_names, relative_paths),
+            )
+            registered = cur.rowcount
+        db_conn.commit()
+        if registered:
+            logger.info("Registered %d new ingestion jobs", registered)
+        return registered
+
+    def claim(self, db_conn: psycopg2.extensions.connection) -> NamedFiles:
+        with db_conn.cursor() as cur:
+            cur.execute(
+                sql.SQL(
+                    """UPDATE {schema}.{table} AS job
+                    SET claimed_by = %(worker_id)s,
+                        claimed_until = now() + %(lease_seconds)s * interval '1 second',
+                        attempts = job.attempts + 1
+                    FROM (
+                        SELECT processor, relative_path, claimed_by AS expired_claim
+                        FROM {schema}.{table}
+                        WHERE queue = %(queue)s
+                            AND (claimed_until IS NULL OR claimed_until < now())
+                        ORDER BY registered_at, processor, relative_path
+                        LIMIT %(limit)s
+                        FOR UPDATE SKIP LOCKED
+                    ) AS due
+                    WHERE job.queue = %(queue)s
+                        AND job.processor = due.processor
+                        AND job.relative_path = due.relative_path
+                    RETURNING job.processor, job.relative_path, due.expired_claim"""
+                ).format(**self._table_args),
+                {
+                    "worker_id": self.worker_id,
+                    "lease_seconds": self.lease_seconds,
+                    "queue": self.queue,
+                    "limit": self.claim_batch_size,
+                },
+            )
+            rows = cur.fetchall()
+        db_conn.commit()
+        claimed_files = []
+        for processor_name, relative_path, expired_claim in sorted(rows):
+            file_path = self.input_roots[processor_name] / relative_path
+            if expired_claim is not None:
+                logger.warning(
+                    "Reclaimed %s after the lease of %s expired",
+                    file_path,
+                    expired_claim,
+                )
+            claimed_files.append((processor_name, file_path))
+        return claimed_files
+
+    def finish(
+        self, db_conn: psycopg2.extensions.connection, claimed_files: NamedFiles
+    ) -> None:
+        # Archived or quarantined files are gone from the input directory and
+        # their jobs are done; anything still there is released for a retry
+        done_files = [entry for entry in claimed_files if not entry[1].exists()]
+        pending_files = [entry for entry in claimed_files if entry[1].exists()]
+        with db_conn.cursor() as cur:
+            if done_files:
+                processor_names, relative_paths = self._job_keys(done_files)
+                cur.execute(
+                    sql.SQL(
+                        "DELETE FROM {schema}.{table} WHERE queue = %s AND claimed_by = %s"
+                        " AND (processor, relative_path) IN"
+                        " (SELECT unnest(%s::text[]), unnest(%s::text[]))"
+                    ).format(**self._table_args),
+                    (self.queue, self.worker_id, processor_names, relative_paths),
+                )
+            if pending_files:
+                processor_names, relative_paths = self._job_keys(pending_files)
+                cur.execute(
+                    sql.SQL(
+                        "UPDATE {schema}.{table} SET claimed_by = NULL,"
+                        " claimed_until = now() + %s * interval '1 second'"
+                        " WHERE queue = %s AND claimed_by = %s"
+                        " AND (processor, relative_path) IN"
+                        " (SELECT unnest(%s::text[]), unnest(%s::text[]))"
+                    ).format(**self._table_args),
+                    (
+                        RELEASE_DELAY_SECONDS,
+                        self.queue,
+                        self.worker_id,
+                        processor_names,
+                        relative_paths,
+                    ),
+                )
+        db_conn.commit()
@@ -0,0 +1,83 @@
+from pathlib import Path
+from typing import Optional
+from .base_statement_processor import BaseStatementProcessor
+from .ingestion_ledger import FileDigest
+import polars as pl
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class ParseCache:
+    # parse_file output stored as Parquet, keyed by content hash and the
+    # processor's parser_version so a parser change never serves stale frames
+    def __init__(self, cache_dir: Path, max_size_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(
+        self, processor: BaseStatementProcessor.__class__, file_digest: FileDigest
+    ) -> Path:
+        return self.cache_dir / (
+            f"{processor.__name__}-v{processor.parser_version}"
+            f"-{file_digest.sha256}.parquet"
+        )
+
+    def get(
+        self,
+        processor: BaseStatementProcessor.__class__,
+        file_digest: FileDigest,
+        file_path: Path,
+    ) -> Optional[pl.DataFrame]:
+        entry_path = self._entry_path(processor, file_digest)
+        try:
+            data = pl.read_parquet(entry_path, memory_map=True)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(
+                "Dropping unreadable parse cache entry %s: %s", entry_path, e
+            )
+            entry_path.unlink(missing_ok=True)
+            return None
+        # mtime doubles as the last-used time for LRU eviction
+        os.utime(entry_path)
+        logger.info("Parse cache hit for %s", entry_path.name)
+        # The same content may have been cached under another file name
+        return data.with_columns(
+            pl.lit(file_path.name, dtype=pl.String).alias(column)
+            for column in processor.file_name_columns
+        )
+
+    def put(
+        self,
+        processor: BaseStatementProcessor.__class__,
+        file_digest: FileDigest,
+        data: pl.DataFrame,
+    ) -> None:
+        entry_path = self._entry_path(processor, file_digest)
+        tmp_path = entry_path.with_name(entry_path.name + ".tmp")
+        data.with_columns(
+            pl.lit(None, dtype=pl.String).alias(column)
+            for column in processor.file_name_columns
+        ).write_parquet(tmp_path)
+        tmp_path.replace(entry_path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = [
+            (entry.stat().st_mtime, entry.stat().st_size, entry)
+            for entry in self.cache_dir.glob("*.parquet")
+        ]
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total_size <= self.max_size_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total_size -= size
+
+    def clear(self) -> None:
+        for entry in self.cache_dir.glob("*.parquet*"):
+            entry.unlink(missing_ok=True)
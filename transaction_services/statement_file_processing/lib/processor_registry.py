@@ -0,0 +1,61 @@
+from functools import cache
+from importlib import import_module
+from importlib.metadata import entry_points
+from .base_statement_processor import BaseStatementProcessor
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Third-party processors register a "module:Class" under this group, named
+# after the statement_services config key they handle
+PROCESSOR_ENTRY_POINT_GROUP = "transaction_services.statement_processors"
+
+_LIB_PACKAGE = "transaction_services.statement_file_processing.lib"
+
+# Keyed by statement_services config key; stored as import paths so a bank's
+# parser dependencies are only imported once one of its files shows up
+BUILTIN_PROCESSORS = {
+    "abn_debit_stmt": f"{_LIB_PACKAGE}.abn_statement_processing:AbnStatementProcessor",
+    "credit_card_stmt": f"{_LIB_PACKAGE}.ics_credit_statement_processing:IcsCreditStatementProcessor",
+    "bunq_stmt": f"{_LIB_PACKAGE}.bunq_statement_processing:BunqStatementProcessor",
+}
+
+
+class ProcessorRegistry:
+    def __init__(self, targets: dict[str, str]):
+        self._targets = targets
+        self._loaded: dict[str, BaseStatementProcessor.__class__] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._targets
+
+    def names(self) -> list[str]:
+        return list(self._targets)
+
+    def load(self, name: str) -> BaseStatementProcessor.__class__:
+        if name not in self._loaded:
+            module_name, _, class_name = self._targets[name].partition(":")
+            processor = getattr(import_module(module_name), class_name)
+            if not issubclass(processor, BaseStatementProcessor):
+                raise TypeError(
+                    f"{self._targets[name]} is not a BaseStatementProcessor"
+                )
+            logger.info(
+                "Loaded statement processor %s for %s", processor.__name__, name
+            )
+            self._loaded[name] = processor
+        return self._loaded[name]
+
+
+@cache
+def get_processor_registry() -> ProcessorRegistry:
+    targets = dict(BUILTIN_PROCESSORS)
+    for entry_point in entry_points(group=PROCESSOR_ENTRY_POINT_GROUP):
+        if entry_point.name in targets:
+            logger.warning(
+                "Statement processor plugin %s overrides %s",
+                entry_point.value,
+                targets[entry_point.name],
+            )
+        targets[entry_point.name] = entry_point.value
+    return ProcessorRegistry(targets)
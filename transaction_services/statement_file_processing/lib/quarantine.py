@@ -0,0 +1,139 @@
+from pathlib import Path
+from typing import Optional
+from .base_statement_processor import BaseStatementProcessor
+import psycopg2
+import datetime
+import json
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+QUARANTINE_DIR_NAME = "quarantine"
+ERROR_SIDECAR_SUFFIX = ".error.json"
+
+# The database being unreachable says nothing about the file itself
+TRANSIENT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+def is_transient_error(error: Exception) -> bool:
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class FileQuarantine:
+    # Failed files move to <input dir>/quarantine next to a JSON sidecar with
+    # the error and the retry schedule; input globs are not recursive, so the
+    # scan loop no longer sees them until they are requeued
+    def __init__(self, retry_base_seconds: float, retry_max_seconds: float):
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+
+    def retry_delay_seconds(self, failure_count: int) -> float:
+        return min(
+            self.retry_base_seconds * 2 ** (failure_count - 1), self.retry_max_seconds
+        )
+
+    @staticmethod
+    def _sidecar_path(quarantined_path: Path) -> Path:
+        return quarantined_path.with_name(quarantined_path.name + ERROR_SIDECAR_SUFFIX)
+
+    @staticmethod
+    def _read_sidecar(sidecar_path: Path) -> Optional[dict]:
+        try:
+            with open(sidecar_path) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def quarantine_file(
+        self,
+        processor: BaseStatementProcessor.__class__,
+        file_path: Path,
+        error: Exception,
+    ) -> Optional[Path]:
+        if not file_path.exists():
+            return None
+        quarantine_dir = file_path.parent / QUARANTINE_DIR_NAME
+        quarantine_dir.mkdir(exist_ok=True)
+        quarantined_path = quarantine_dir / file_path.name
+        sidecar_path = self._sidecar_path(quarantined_path)
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        previous = self._read_sidecar(sidecar_path) or {}
+        failure_count = previous.get("failure_count", 0) + 1
+        next_retry_at = now + datetime.timedelta(
+            seconds=self.retry_delay_seconds(failure_count)
+        )
+        sidecar = {
+            "original_path": str(file_path.resolve()),
+            "processor": processor.__name__,
+            "error_type": type(error).__name__,
+            "error": str(error),
+            "traceback": "".join(traceback.format_exception(error)),
+            "failure_count": failure_count,
+            "first_failed_at": previous.get("first_failed_at", now.isoformat()),
+            "last_failed_at": now.isoformat(),
+            "next_retry_at": next_retry_at.isoformat(),
+        }
+        tmp_path = sidecar_path.with_name(sidecar_path.name + ".tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(sidecar, file, indent=2)
+        tmp_path.replace(sidecar_path)
+        file_path.replace(quarantined_path)
+        logger.warning(
+            "Quarantined %s after %d failure(s), next retry at %s",
+            file_path,
+            failure_count,
+            next_retry_at.isoformat(),
+        )
+        return quarantined_path
+
+    def forget(self, file_path: Path) -> None:
+        # Called once a requeued file went through, so its history is dropped
+        self._sidecar_path(
+            file_path.parent / QUARANTINE_DIR_NAME / file_path.name
+        ).unlink(missing_ok=True)
+
+    def requeue(self, input_dirs: list[Path], due_only: bool = True) -> list[Path]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        requeued_files = []
+        for input_dir in input_dirs:
+            quarantine_dir = input_dir / QUARANTINE_DIR_NAME
+            if not quarantine_dir.is_dir():
+                continue
+            for sidecar_path in sorted(quarantine_dir.glob("*" + ERROR_SIDECAR_SUFFIX)):
+                quarantined_path = sidecar_path.with_name(
+                    sidecar_path.name.removesuffix(ERROR_SIDECAR_SUFFIX)
+                )
+                target_path = input_dir / quarantined_path.name
+                if not quarantined_path.exists():
+                    # Requeued and awaiting its retry, or moved away by hand
+                    if not target_path.exists():
+                        sidecar_path.unlink(missing_ok=True)
+                    continue
+                sidecar = self._read_sidecar(sidecar_path) or {}
+                next_retry_at = sidecar.get("next_retry_at")
+                if (
+                    due_only
+                    and next_retry_at is not None
+                    and datetime.datetime.fromisoformat(next_retry_at) > now
+                ):
+                    continue
+                if target_path.exists():
+                    logger.warning(
+                        "Not requeueing %s, %s already exists",
+                        quarantined_path,
+                        target_path,
+                    )
+                    continue
+                try:
+                    quarantined_path.replace(target_path)
+                except FileNotFoundError:
+                    # Requeued by another daemon sharing the input directory
+                    continue
+                if not due_only:
+                    # A manual requeue follows a fix, so the backoff starts over
+                    sidecar_path.unlink(missing_ok=True)
+                logger.info("Requeued %s", target_path)
+                requeued_files.append(target_path)
+        return requeued_files
@@ -0,0 +1,210 @@
+from psycopg2 import sql
+import psycopg2
+import polars as pl
+import hashlib
+import logging
+from transaction_services.config.db_constants import TX_SCHEMA, DEBIT_TX_TABLE
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_COLUMN = "row_fingerprint"
+FINGERPRINT_INDEX = "debit_transactions_row_fingerprint_key"
+
+# Columns that identify a debit transaction, formerly the composite ON
+# CONFLICT key; desc_json is bank metadata and deliberately left out
+FINGERPRINT_DATE_COLUMN = "tx_date"
+FINGERPRINT_AMOUNT_COLUMNS = ["tx_amount", "start_balance", "end_balance"]
+FINGERPRINT_TEXT_COLUMNS = ["account", "currency", "description", "bank"]
+
+# ASCII unit separator, which never occurs in statement text
+_FIELD_SEPARATOR = "\x1f"
+
+
+def _rounded_cents(column: str, scale: int) -> pl.Expr:
+    # Half away from zero like Postgres round(numeric), in integer math on
+    # the unscaled value: multiplying by 10^scale is exact and leaves nothing
+    # for the Int64 cast to truncate or round
+    unscaled = (pl.col(column) * pl.lit(10**scale, dtype=pl.Decimal(38, 0))).cast(
+        pl.Int64
+    )
+    if scale <= 2:
+        return unscaled * 10 ** (2 - scale)
+    step = 10 ** (scale - 2)
+    return unscaled.sign() * ((unscaled.abs() + step // 2) // step)
+
+
+def _canonical_row_text(schema: pl.Schema) -> pl.Expr:
+    # Must stay identical to _FINGERPRINT_SQL so the backfill matches parsing:
+    # dates as days since epoch and amounts as rounded integer cents, which
+    # both sides render the same regardless of DateStyle or numeric scale
+    fields = [pl.col(FINGERPRINT_DATE_COLUMN).cast(pl.Int32).cast(pl.String)]
+    fields += [
+        _rounded_cents(column, schema[column].scale).cast(pl.String)
+        for column in FINGERPRINT_AMOUNT_COLUMNS
+    ]
+    fields += [pl.col(column).cast(pl.String) for column in FINGERPRINT_TEXT_COLUMNS]
+    return pl.concat_str(
+        [field.fill_null("") for field in fields], separator=_FIELD_SEPARATOR
+    )
+
+
+def _md5_uuid(canonical_text: pl.Series) -> pl.Series:
+    # md5 is the digest Postgres can reproduce for the backfill, and its 128
+    # bits fit the 16 byte uuid type; this is a dedup key, not a security one.
+    # Polars has no md5 expression and its hash() is neither stable across
+    # releases nor available in SQL, so this stays the one per-row Python
+    # step of parsing, one to two microseconds per row.
+    return pl.Series(
+        [
+            hashlib.md5(text.encode(), usedforsecurity=False).hexdigest()
+            for text in canonical_text
+        ],
+        dtype=pl.String,
+    )
+
+
+def with_row_fingerprint(df: pl.DataFrame) -> pl.DataFrame:
+    return df.with_columns(
+        _canonical_row_text(df.schema)
+        .map_batches(_md5_uuid, return_dtype=pl.String)
+        .alias(FINGERPRINT_COLUMN)
+    )
+
+
+_FINGERPRINT_SQL = sql.SQL(
+    "md5(concat_ws(chr(31), coalesce(({date_column} - DATE '1970-01-01')::text, ''), {amounts}, {texts}))::uuid"
+).format(
+    date_column=sql.Identifier(FINGERPRINT_DATE_COLUMN),
+    amounts=sql.SQL(", ").join(
+        sql.SQL("coalesce(round({} * 100)::bigint::text, '')").format(
+            sql.Identifier(column)
+        )
+        for column in FINGERPRINT_AMOUNT_COLUMNS
+    ),
+    texts=sql.SQL(", ").join(
+        sql.SQL("coalesce({}, '')").format(sql.Identifier(column))
+        for column in FINGERPRINT_TEXT_COLUMNS
+    ),
+)
+
+
+def _drop_composite_unique_keys(cur: psycopg2.extensions.cursor) -> None:
+    # The old key spanned every column including description; once the
+    # fingerprint index exists it only slows down inserts. It may be a
+    # constraint or a unique index created on its own.
+    cur.execute(
+        """SELECT con.conname
+        FROM pg_constraint con
+        JOIN pg_class rel ON rel.oid = con.conrelid
+        JOIN pg_namespace nsp ON nsp.oid = rel.relnamespace
+        JOIN pg_attribute att ON att.attrelid = rel.oid AND att.attnum = ANY (con.conkey)
+        WHERE nsp.nspname = %s AND rel.relname = %s AND con.contype = 'u'
+            AND att.attname = 'description'""",
+        (TX_SCHEMA, DEBIT_TX_TABLE),
+    )
+    for (constraint_name,) in cur.fetchall():
+        logger.info(
+            "Dropping composite unique constraint %s on %s.%s",
+            constraint_name,
+            TX_SCHEMA,
+            DEBIT_TX_TABLE,
+        )
+        cur.execute(
+            sql.SQL("ALTER TABLE {schema}.{table} DROP CONSTRAINT {constraint}").format(
+                schema=sql.Identifier(TX_SCHEMA),
+                table=sql.Identifier(DEBIT_TX_TABLE),
+                constraint=sql.Identifier(constraint_name),
+            )
+        )
+    cur.execute(
+        """SELECT idx_rel.relname
+        FROM pg_index idx
+        JOIN pg_class idx_rel ON idx_rel.oid = idx.indexrelid
+        JOIN pg_class rel ON rel.oid = idx.indrelid
+        JOIN pg_namespace nsp ON nsp.oid = rel.relnamespace
+        JOIN pg_attribute att ON att.attrelid = rel.oid AND att.attnum = ANY (idx.indkey)
+        WHERE nsp.nspname = %s AND rel.relname = %s AND idx.indisunique
+            AND att.attname = 'description'
+            AND NOT EXISTS (SELECT 1 FROM pg_constraint con WHERE con.conindid = idx.indexrelid)""",
+        (TX_SCHEMA, DEBIT_TX_TABLE),
+    )
+    for (index_name,) in cur.fetchall():
+        logger.info(
+            "Dropping composite unique index %s on %s.%s",
+            index_name,
+            TX_SCHEMA,
+            DEBIT_TX_TABLE,
+        )
+        cur.execute(
+            sql.SQL("DROP INDEX {schema}.{index}").format(
+                schema=sql.Identifier(TX_SCHEMA), index=sql.Identifier(index_name)
+            )
+        )
+
+
+def ensure_debit_row_fingerprint(cur: psycopg2.extensions.cursor) -> None:
+    # Idempotent migration: add the column, backfill rows that predate it,
+    # index it and retire the wide composite unique key
+    table_args = dict(
+        schema=sql.Identifier(TX_SCHEMA),
+        table=sql.Identifier(DEBIT_TX_TABLE),
+        column=sql.Identifier(FINGERPRINT_COLUMN),
+    )
+    cur.execute(
+        sql.SQL(
+            "ALTER TABLE {schema}.{table} ADD COLUMN IF NOT EXISTS {column} uuid"
+        ).format(**table_args)
+    )
+    # The old composite key treated NULLs as distinct, so rows differing
+    # only in NULL columns can share a fingerprint. The first such row by id
+    # keeps it, the others get one salted with their id, so neither the
+    # unique index nor a row already fingerprinted aborts the migration.
+    cur.execute(sql.SQL("""WITH computed AS (
+                SELECT id, {fingerprint} AS fingerprint
+                FROM {schema}.{table}
+                WHERE {column} IS NULL
+            ),
+            ranked AS (
+                SELECT
+                    id,
+                    fingerprint,
+                    row_number() OVER (PARTITION BY fingerprint ORDER BY id) > 1
+                    OR EXISTS (
+                        SELECT 1 FROM {schema}.{table} existing
+                        WHERE existing.{column} = computed.fingerprint
+                    ) AS collides
+                FROM computed
+            ),
+            updated AS (
+                UPDATE {schema}.{table} t
+                SET {column} = CASE
+                    WHEN ranked.collides
+                        THEN md5(ranked.fingerprint::text || ':' || t.id)::uuid
+                    ELSE ranked.fingerprint
+                END
+                FROM ranked
+                WHERE t.id = ranked.id
+                RETURNING t.id, ranked.collides
+            )
+            SELECT
+                count(*),
+                coalesce(array_agg(id ORDER BY id) FILTER (WHERE collides), '{{}}')
+            FROM updated""").format(fingerprint=_FINGERPRINT_SQL, **table_args))
+    backfilled_count, colliding_ids = cur.fetchone()
+    if backfilled_count:
+        logger.info("Backfilled %d row fingerprints", backfilled_count)
+    if colliding_ids:
+        logger.warning(
+            "%d rows of %s.%s duplicate an earlier row apart from NULL columns and "
+            "were given a fingerprint of their own, check ids %s",
+            len(colliding_ids),
+            TX_SCHEMA,
+            DEBIT_TX_TABLE,
+            colliding_ids,
+        )
+    cur.execute(
+        sql.SQL(
+            "CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {schema}.{table} ({column})"
+        ).format(index=sql.Identifier(FINGERPRINT_INDEX), **table_args)
+    )
+    _drop_composite_unique_keys(cur)
@@ -1,63 +1,730 @@
 from pathlib import Path
+from .lib.balance_validation import (
+    ensure_balance_breaks_table,
+    ensure_validation_state_table,
+    validate_balance_continuity,
+)
 from .lib.base_statement_processor import BaseStatementProcessor
-from .lib.abn_statement_processing import AbnStatementProcessor
-from .lib.bunq_statement_processing import BunqStatementProcessor
-from .lib.ics_credit_statement_processing import (
-    IcsCreditStatementProcessor,
+from .lib.change_log import ensure_change_log_table
+from .lib.bulk_loader import LoadResult, bulk_load, bulk_load_batches
+from .lib.db_pool import IngestionConnectionPool, rollback_if_open
+from .lib.file_archive import ARCHIVE_DIR_NAME, FileArchive
+from .lib.file_watcher import create_file_watcher, FileDebouncer
+from .lib.ingestion_metrics import (
+    CycleSummary,
+    FileIngestionMetrics,
+    IngestionMetrics,
+)
+from .lib.ingestion_ledger import (
+    FileDigest,
+    FileDigestCache,
+    ensure_ledger_table,
+    get_file_digest,
+    get_ledger_time,
+    is_file_ingested,
+    record_ingested_file,
+)
+from .lib.input_scanner import InputDirScanner, scan_input_dir
+from .lib.job_queue import (
+    IngestionJobQueue,
+    NamedFiles,
+    default_worker_id,
+    ensure_job_table,
+)
+from .lib.parse_cache import ParseCache
+from .lib.processor_registry import get_processor_registry
+from .lib.row_fingerprint import ensure_debit_row_fingerprint
+from .lib.quarantine import QUARANTINE_DIR_NAME, FileQuarantine, is_transient_error
+from transaction_services.config.data_versions import (
+    bump_data_versions,
+    ensure_data_versions_table,
+)
+from transaction_services.config.db_constants import MONTHLY_CATEGORY_TOTALS_TABLE
+from transaction_services.config.monthly_category_totals import (
+    CategoryTotalsMismatch,
+    ensure_monthly_category_totals,
+    find_category_totals_mismatches,
+    refresh_monthly_category_totals,
 )
 from transaction_services.config.config_reader import (
     get_config,
     Config,
     StmtInputFileConfig,
 )
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+import polars as pl
 import psycopg2
 import argparse
+import asyncio
+import datetime
 import logging
+import os
 import sys
+import time
 from time import sleep
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout, encoding="utf-8", level=logging.INFO)
 
+# How often watch mode wakes up to requeue quarantined files that are due
+REQUEUE_CHECK_SECONDS = 60.0
+# How often months marked stale by edits in the dashboard are re-aggregated;
+# the dashboard only reads the totals and sums stale months from the rows
+CATEGORY_TOTALS_REFRESH_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class IngestionContext:
+    parse_executor: Optional[ProcessPoolExecutor] = None
+    digest_cache: Optional[FileDigestCache] = None
+    parse_cache: Optional[ParseCache] = None
+    metrics: IngestionMetrics = field(default_factory=IngestionMetrics)
+    quarantine: Optional[FileQuarantine] = None
+    archive: FileArchive = field(default_factory=FileArchive)
+    input_scanner: InputDirScanner = field(default_factory=InputDirScanner)
+    # Files at least this large are loaded batch by batch instead of as one frame
+    stream_min_bytes: Optional[int] = None
+    # Parsed files allowed to wait for the DB writer, bounding memory use
+    pipeline_depth: int = 2
+    validate_balances: bool = False
+    # Set when several daemons share the input directories
+    job_queue: Optional[IngestionJobQueue] = None
+    # With --reingest, ledger entries older than this do not make a file a
+    # duplicate; files loaded by this run still do
+    reingest_since: Optional[datetime.datetime] = None
+
+    def should_stream(self, file_digest: FileDigest) -> bool:
+        return (
+            self.stream_min_bytes is not None
+            and file_digest.size >= self.stream_min_bytes
+        )
+
+
+def is_already_ingested(
+    file_path: Path,
+    file_digest: FileDigest,
+    db_conn: psycopg2.extensions.connection,
+    ingested_since: Optional[datetime.datetime] = None,
+) -> bool:
+    with db_conn.cursor() as cur:
+        if is_file_ingested(cur, file_digest, ingested_since):
+            logger.info(
+                "Skipping %s, identical content already ingested (sha256 %s)",
+                file_path,
+                file_digest.sha256,
+            )
+            return True
+    return False
+
+
+def load_parsed_file(
+    processor: BaseStatementProcessor.__class__,
+    file_path: Path,
+    file_digest: FileDigest,
+    data: pl.DataFrame,
+    db_conn: psycopg2.extensions.connection,
+    file_metrics: Optional[FileIngestionMetrics] = None,
+) -> None:
+    logger.info("Processing file: %s", file_path)
+    # Rendering a whole statement is costly, keep it out of the INFO path
+    logger.debug("Data:\n%s", data)
+    started = time.perf_counter()
+    with db_conn.cursor() as cur:
+        load_result = bulk_load(cur, processor, file_path, data)
+        record_ingested_file(cur, file_digest, processor, file_path, load_result)
+        if load_result.inserted or load_result.updated:
+            bump_data_versions(cur, [processor.db_table])
+        db_conn.commit()
+    if file_metrics is not None:
+        file_metrics.record_load(load_result, time.perf_counter() - started)
+    log_load_result(file_path, load_result)
+
+
+def log_load_result(file_path: Path, load_result: LoadResult) -> None:
+    logger.info(
+        "Loaded %s: %d rows, %d inserted, %d updated, %d unchanged",
+        file_path,
+        load_result.rows_in_file,
+        load_result.inserted,
+        load_result.updated,
+        load_result.skipped,
+    )
+
+
+def _timed_batches(
+    batches: Iterator[pl.DataFrame], file_metrics: FileIngestionMetrics
+) -> Iterator[pl.DataFrame]:
+    # Parsing and copying interleave, so the parse side is timed per batch
+    while True:
+        started = time.perf_counter()
+        batch = next(batches, None)
+        file_metrics.parse_seconds += time.perf_counter() - started
+        if batch is None:
+            return
+        file_metrics.rows_parsed += len(batch)
+        yield batch
+
+
+def stream_load_file(
+    processor: BaseStatementProcessor.__class__,
+    file_path: Path,
+    file_digest: FileDigest,
+    db_conn: psycopg2.extensions.connection,
+    file_metrics: FileIngestionMetrics,
+) -> None:
+    logger.info(
+        "Processing file in batches of %d rows: %s", processor.batch_rows, file_path
+    )
+    started = time.perf_counter()
+    with db_conn.cursor() as cur:
+        load_result = bulk_load_batches(
+            cur,
+            processor,
+            file_path,
+            _timed_batches(processor.iter_batches(file_path), file_metrics),
+        )
+        record_ingested_file(cur, file_digest, processor, file_path, load_result)
+        if load_result.inserted or load_result.updated:
+            bump_data_versions(cur, [processor.db_table])
+        db_conn.commit()
+    file_metrics.record_load(
+        load_result, time.perf_counter() - started - file_metrics.parse_seconds
+    )
+    log_load_result(file_path, load_result)
+
+
+def handle_failed_file(
+    processor: BaseStatementProcessor.__class__,
+    file_path: Path,
+    error: Exception,
+    db_conn: psycopg2.extensions.connection,
+    ingestion_context: IngestionContext,
+) -> None:
+    rollback_if_open(db_conn)
+    logger.exception(error)
+    if ingestion_context.quarantine is not None and not is_transient_error(error):
+        try:
+            ingestion_context.quarantine.quarantine_file(processor, file_path, error)
+        except OSError as e:
+            logger.exception(e)
+
+
+def parse_file_cached(
+    processor: BaseStatementProcessor.__class__,
+    file_path: Path,
+    file_digest: FileDigest,
+    parse_cache: Optional[ParseCache],
+) -> pl.DataFrame:
+    if parse_cache is None:
+        return processor.parse_file(file_path)
+    data = parse_cache.get(processor, file_digest, file_path)
+    if data is None:
+        data = processor.parse_file(file_path)
+        parse_cache.put(processor, file_digest, data)
+    return data
+
 
 def process_file(
     processor: BaseStatementProcessor.__class__,
     file_path: Path,
     db_conn: psycopg2.extensions.connection,
+    ingestion_context: Optional[IngestionContext] = None,
 ) -> bool:
+    if ingestion_context is None:
+        ingestion_context = IngestionContext()
+    with ingestion_context.metrics.track_file(processor, file_path) as file_metrics:
+        try:
+            file_digest = get_file_digest(file_path, ingestion_context.digest_cache)
+            file_metrics.bytes_read = file_digest.size
+            if is_already_ingested(
+                file_path, file_digest, db_conn, ingestion_context.reingest_since
+            ):
+                file_metrics.status = "duplicate"
+                return True
+            if ingestion_context.should_stream(file_digest):
+                stream_load_file(
+                    processor, file_path, file_digest, db_conn, file_metrics
+                )
+                return True
+            started = time.perf_counter()
+            data = parse_file_cached(
+                processor, file_path, file_digest, ingestion_context.parse_cache
+            )
+            file_metrics.record_parse(len(data), time.perf_counter() - started)
+            load_parsed_file(
+                processor, file_path, file_digest, data, db_conn, file_metrics
+            )
+        except Exception as e:
+            handle_failed_file(processor, file_path, e, db_conn, ingestion_context)
+            return False
+        return True
+
+
+# Keyed by processor name; the processor class is only imported through
+# get_processor_registry() once a file for it is found
+StmtProcessorConfig = dict[str, StmtInputFileConfig]
+
+
+def get_processor_config(config: Config) -> StmtProcessorConfig:
+    registry = get_processor_registry()
+    processor_config = {}
+    for name, stmt_input in config.stmt_inputs.items():
+        if name in registry:
+            processor_config[name] = stmt_input
+        else:
+            logger.warning("No statement processor registered for %s", name)
+    return processor_config
+
+
+def load_processors(
+    named_files: NamedFiles,
+) -> list[tuple[BaseStatementProcessor.__class__, Path]]:
+    registry = get_processor_registry()
+    return [
+        (registry.load(processor_name), file_path)
+        for processor_name, file_path in named_files
+    ]
+
+
+def scan_new_files(
+    processor_config: StmtProcessorConfig,
+    input_scanner: Optional[InputDirScanner] = None,
+) -> NamedFiles:
+    scan = scan_input_dir if input_scanner is None else input_scanner.scan
+    return [
+        (processor_name, file_path)
+        for processor_name, input_file_conf in processor_config.items()
+        for file_path in scan(input_file_conf.input_dir, input_file_conf.file_glob)
+    ]
+
+
+def find_new_files(
+    processor_config: StmtProcessorConfig,
+    input_scanner: Optional[InputDirScanner] = None,
+) -> list[tuple[BaseStatementProcessor.__class__, Path]]:
+    return load_processors(scan_new_files(processor_config, input_scanner))
+
+
+def scan_backfill_files(
+    processor_config: StmtProcessorConfig, backfill_dir: Path
+) -> NamedFiles:
+    # Archives are often nested by year or bank, so search the whole tree;
+    # a file matching several globs goes to the first processor only
+    backfill_files = {}
+    for processor_name, input_file_conf in processor_config.items():
+        for file_path in backfill_dir.rglob(input_file_conf.file_glob):
+            relative_dirs = file_path.relative_to(backfill_dir).parts[:-1]
+            if (
+                ARCHIVE_DIR_NAME in relative_dirs
+                or QUARANTINE_DIR_NAME in relative_dirs
+            ):
+                continue
+            if file_path.is_file():
+                backfill_files.setdefault(file_path, processor_name)
+    return [
+        (processor_name, file_path)
+        for file_path, processor_name in sorted(backfill_files.items())
+    ]
+
+
+def find_backfill_files(
+    processor_config: StmtProcessorConfig, backfill_dir: Path
+) -> list[tuple[BaseStatementProcessor.__class__, Path]]:
+    return load_processors(scan_backfill_files(processor_config, backfill_dir))
+
+
+def match_file_to_processor_name(
+    processor_config: StmtProcessorConfig, file_path: Path
+) -> Optional[str]:
+    for processor_name, input_file_conf in processor_config.items():
+        if file_path.parent.resolve() == input_file_conf.input_dir.resolve() and (
+            file_path.match(input_file_conf.file_glob)
+        ):
+            return processor_name
+    return None
+
+
+def match_file_to_processor(
+    processor_config: StmtProcessorConfig, file_path: Path
+) -> Optional[BaseStatementProcessor.__class__]:
+    processor_name = match_file_to_processor_name(processor_config, file_path)
+    if processor_name is None:
+        return None
+    return get_processor_registry().load(processor_name)
+
+
+def mark_file_processed(
+    file_path: Path, ingestion_context: Optional[IngestionContext] = None
+) -> None:
+    if ingestion_context is None:
+        ingestion_context = IngestionContext()
+    ingestion_context.archive.archive_file(file_path)
+    if ingestion_context.quarantine is not None:
+        ingestion_context.quarantine.forget(file_path)
+
+
+def _timed_parse(
+    processor: BaseStatementProcessor.__class__, file_path: Path
+) -> tuple[pl.DataFrame, float]:
+    # Runs in the parse worker so the timing excludes queueing in the pool
+    started = time.perf_counter()
+    data = processor.parse_file(file_path)
+    return data, time.perf_counter() - started
+
+
+@dataclass
+class _ParsedFile:
+    processor: BaseStatementProcessor.__class__
+    file_path: Path
+    file_metrics: FileIngestionMetrics
+    file_digest: Optional[FileDigest] = None
+    # None for duplicates, failures and files that are streamed by the writer
+    data: Optional[pl.DataFrame] = None
+    error: Optional[Exception] = None
+
+
+async def _prepare_file(
+    processor: BaseStatementProcessor.__class__,
+    file_path: Path,
+    db_conn: psycopg2.extensions.connection,
+    db_executor: ThreadPoolExecutor,
+    ingestion_context: IngestionContext,
+) -> _ParsedFile:
+    loop = asyncio.get_running_loop()
+    parse_cache = ingestion_context.parse_cache
+    parsed = _ParsedFile(
+        processor,
+        file_path,
+        FileIngestionMetrics(file_path.name, processor.__name__),
+    )
     try:
-        data = processor.parse_file(file_path)
-        logger.info("Processing file: %s", file_path)
-        logger.info("Data:\n%s", data)
-        query = processor.get_update_database_query(file_path, data)
-        with db_conn.cursor() as cur:
-            cur.executemany(query, data.rows())
-            db_conn.commit()
+        parsed.file_digest = await loop.run_in_executor(
+            None, get_file_digest, file_path, ingestion_context.digest_cache
+        )
+        parsed.file_metrics.bytes_read = parsed.file_digest.size
+        if await loop.run_in_executor(
+            db_executor,
+            is_already_ingested,
+            file_path,
+            parsed.file_digest,
+            db_conn,
+            ingestion_context.reingest_since,
+        ):
+            parsed.file_metrics.status = "duplicate"
+            return parsed
+        if ingestion_context.should_stream(parsed.file_digest):
+            return parsed
+        started = time.perf_counter()
+        if parse_cache is not None:
+            parsed.data = await loop.run_in_executor(
+                None, parse_cache.get, processor, parsed.file_digest, file_path
+            )
+        if parsed.data is not None:
+            parse_seconds = time.perf_counter() - started
+        else:
+            parsed.data, parse_seconds = await loop.run_in_executor(
+                ingestion_context.parse_executor, _timed_parse, processor, file_path
+            )
+            if parse_cache is not None:
+                await loop.run_in_executor(
+                    None, parse_cache.put, processor, parsed.file_digest, parsed.data
+                )
+        parsed.file_metrics.record_parse(len(parsed.data), parse_seconds)
+    except Exception as e:
+        parsed.error = e
+    return parsed
+
+
+def _write_parsed_file(
+    parsed: _ParsedFile,
+    db_conn: psycopg2.extensions.connection,
+    ingestion_context: IngestionContext,
+) -> None:
+    try:
+        if parsed.error is not None:
+            raise parsed.error
+        # Checked again in the load transaction, an earlier file of this
+        # batch with the same content may have been written since it was
+        # prepared
+        if parsed.file_metrics.status != "duplicate" and is_already_ingested(
+            parsed.file_path,
+            parsed.file_digest,
+            db_conn,
+            ingestion_context.reingest_since,
+        ):
+            parsed.file_metrics.status = "duplicate"
+        if parsed.file_metrics.status != "duplicate":
+            if parsed.data is None:
+                stream_load_file(
+                    parsed.processor,
+                    parsed.file_path,
+                    parsed.file_digest,
+                    db_conn,
+                    parsed.file_metrics,
+                )
+            else:
+                load_parsed_file(
+                    parsed.processor,
+                    parsed.file_path,
+                    parsed.file_digest,
+                    parsed.data,
+                    db_conn,
+                    parsed.file_metrics,
+                )
+    except Exception as e:
+        handle_failed_file(
+            parsed.processor, parsed.file_path, e, db_conn, ingestion_context
+        )
+    else:
+        mark_file_processed(parsed.file_path, ingestion_context)
+    finally:
+        ingestion_context.metrics.record_file(parsed.file_metrics)
+
+
+async def _run_ingestion_pipeline(
+    new_files: list[tuple[BaseStatementProcessor.__class__, Path]],
+    db_conn: psycopg2.extensions.connection,
+    ingestion_context: IngestionContext,
+) -> None:
+    # Files are parsed up to pipeline_depth ahead of the writer, which loads
+    # them in submission order so DB writes and archiving match the serial
+    # path. psycopg2 is blocking, so every use of db_conn goes through a
+    # single thread, which also keeps the connection out of concurrent use.
+    loop = asyncio.get_running_loop()
+    pipeline_depth = ingestion_context.pipeline_depth
+    queue: asyncio.Queue[Optional[_ParsedFile]] = asyncio.Queue(maxsize=pipeline_depth)
+
+    with ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="ingestion-db"
+    ) as db_executor:
+
+        async def parse_stage() -> None:
+            in_flight: deque[asyncio.Future] = deque()
+            for processor_class, file_path in new_files:
+                in_flight.append(
+                    asyncio.ensure_future(
+                        _prepare_file(
+                            processor_class,
+                            file_path,
+                            db_conn,
+                            db_executor,
+                            ingestion_context,
+                        )
+                    )
+                )
+                if len(in_flight) >= pipeline_depth:
+                    await queue.put(await in_flight.popleft())
+            while in_flight:
+                await queue.put(await in_flight.popleft())
+            await queue.put(None)
+
+        async def write_stage() -> None:
+            while (parsed := await queue.get()) is not None:
+                await loop.run_in_executor(
+                    db_executor, _write_parsed_file, parsed, db_conn, ingestion_context
+                )
+
+        await asyncio.gather(parse_stage(), write_stage())
+
+
+def process_new_files(
+    new_files: list[tuple[BaseStatementProcessor.__class__, Path]],
+    db_conn: psycopg2.extensions.connection,
+    ingestion_context: Optional[IngestionContext] = None,
+) -> CycleSummary:
+    if ingestion_context is None:
+        ingestion_context = IngestionContext()
+    ingestion_context.metrics.start_cycle(len(new_files))
+    if len(new_files) > 1:
+        asyncio.run(_run_ingestion_pipeline(new_files, db_conn, ingestion_context))
+    else:
+        for processor_class, file_path in new_files:
+            is_success = process_file(
+                processor_class, file_path, db_conn, ingestion_context
+            )
+            if is_success:
+                mark_file_processed(file_path, ingestion_context)
+    if ingestion_context.digest_cache is not None:
+        ingestion_context.digest_cache.save()
+    summary = ingestion_context.metrics.record_cycle()
+    if summary.files_by_status.get("loaded"):
+        try:
+            refresh_category_totals(db_conn)
+        except Exception as e:
+            rollback_if_open(db_conn)
+            logger.exception(e)
+    if ingestion_context.validate_balances and summary.files_by_status.get("loaded"):
+        try:
+            validate_balance_continuity(db_conn)
+        except Exception as e:
+            rollback_if_open(db_conn)
+            logger.exception(e)
+    return summary
+
+
+def refresh_category_totals(db_conn: psycopg2.extensions.connection) -> None:
+    # Done here so the dashboard does not pay for freshly loaded months
+    with db_conn.cursor() as cur:
+        refreshed_months = refresh_monthly_category_totals(cur)
+        if refreshed_months:
+            bump_data_versions(cur, [MONTHLY_CATEGORY_TOTALS_TABLE])
+    db_conn.commit()
+    if refreshed_months:
+        logger.info("Refreshed category totals for %d months", len(refreshed_months))
+
+
+def refresh_category_totals_from_pool(db_pool: IngestionConnectionPool) -> None:
+    try:
+        with db_pool.connection() as db_conn:
+            refresh_category_totals(db_conn)
     except Exception as e:
         logger.exception(e)
-        return False
-    return True
 
 
-StmtProcessorConfig = dict[BaseStatementProcessor.__class__, StmtInputFileConfig]
+def check_category_totals(
+    db_conn: psycopg2.extensions.connection,
+) -> list[CategoryTotalsMismatch]:
+    refresh_category_totals(db_conn)
+    with db_conn.cursor() as cur:
+        mismatches = find_category_totals_mismatches(cur)
+    db_conn.rollback()
+    for mismatch in mismatches:
+        logger.warning(
+            "Category totals differ for %s %s/%s: aggregate %s, rows %s",
+            mismatch.month,
+            mismatch.category,
+            mismatch.subcategory,
+            mismatch.aggregate_amount,
+            mismatch.rows_amount,
+        )
+    logger.info("Checked category totals, %d mismatches", len(mismatches))
+    return mismatches
 
 
-def get_processor_config(config: Config) -> StmtProcessorConfig:
-    return {
-        AbnStatementProcessor: config.abn_stmt_input,
-        BunqStatementProcessor: config.bunq_stmt_input,
-        IcsCreditStatementProcessor: config.credit_card_stmt_input,
-    }
+def process_queued_files(
+    named_files: NamedFiles,
+    db_conn: psycopg2.extensions.connection,
+    ingestion_context: IngestionContext,
+) -> list[CycleSummary]:
+    # Registers what this daemon found, then keeps claiming batches until no
+    # job is left, so daemons sharing the input directories split the backlog
+    job_queue = ingestion_context.job_queue
+    job_queue.register_files(db_conn, named_files)
+    summaries = []
+    while claimed_files := job_queue.claim(db_conn):
+        # Jobs registered again by a scan that raced with archiving
+        existing_files = [entry for entry in claimed_files if entry[1].exists()]
+        try:
+            summaries.append(
+                process_new_files(
+                    load_processors(existing_files), db_conn, ingestion_context
+                )
+            )
+        finally:
+            job_queue.finish(db_conn, claimed_files)
+    return summaries
 
 
 def delegate_new_files_to_processor(
-    processor_config: StmtProcessorConfig, db_conn: psycopg2.extensions.connection
+    processor_config: StmtProcessorConfig,
+    db_conn: psycopg2.extensions.connection,
+    ingestion_context: Optional[IngestionContext] = None,
 ) -> None:
-    for processor_class, input_file_conf in processor_config.items():
-        for file_path in input_file_conf.input_dir.glob(input_file_conf.file_glob):
-            is_success = process_file(processor_class, file_path, db_conn)
-            if is_success:
-                file_path.rename(file_path.parent / (file_path.name + ".success"))
+    if ingestion_context is None:
+        ingestion_context = IngestionContext()
+    requeue_due_files(processor_config, ingestion_context)
+    named_files = scan_new_files(processor_config, ingestion_context.input_scanner)
+    if ingestion_context.job_queue is not None:
+        process_queued_files(named_files, db_conn, ingestion_context)
+        return
+    process_new_files(load_processors(named_files), db_conn, ingestion_context)
+
+
+def requeue_due_files(
+    processor_config: StmtProcessorConfig, ingestion_context: IngestionContext
+) -> list[Path]:
+    if ingestion_context.quarantine is None:
+        return []
+    return ingestion_context.quarantine.requeue(
+        [conf.input_dir for conf in processor_config.values()]
+    )
+
+
+def prepare_database(db_pool: IngestionConnectionPool) -> None:
+    with db_pool.connection() as db_conn:
+        with db_conn.cursor() as cur:
+            ensure_ledger_table(cur)
+            ensure_debit_row_fingerprint(cur)
+            ensure_change_log_table(cur)
+            ensure_validation_state_table(cur)
+            ensure_balance_breaks_table(cur)
+            ensure_job_table(cur)
+            ensure_data_versions_table(cur)
+            ensure_monthly_category_totals(cur)
+        db_conn.commit()
+
+
+def watch_input_dirs(
+    processor_config: StmtProcessorConfig,
+    db_pool: IngestionConnectionPool,
+    ingestion_context: IngestionContext,
+    settle_seconds: float,
+    poll_interval: float,
+) -> None:
+    watcher = create_file_watcher(
+        [conf.input_dir for conf in processor_config.values()], poll_interval
+    )
+    debouncer = FileDebouncer(settle_seconds)
+    # Files that arrived while the daemon was down never produce an event
+    for _, file_path in find_new_files(processor_config):
+        debouncer.touch(file_path)
+    totals_refreshed_at = float("-inf")
+    try:
+        while True:
+            if debouncer.has_pending():
+                timeout = settle_seconds
+            elif ingestion_context.quarantine is not None:
+                timeout = min(REQUEUE_CHECK_SECONDS, CATEGORY_TOTALS_REFRESH_SECONDS)
+            else:
+                timeout = CATEGORY_TOTALS_REFRESH_SECONDS
+            for file_path in watcher.read_changed_paths(timeout):
+                if match_file_to_processor(processor_config, file_path) is not None:
+                    debouncer.touch(file_path)
+            for file_path in requeue_due_files(processor_config, ingestion_context):
+                debouncer.touch(file_path)
+            if (
+                time.monotonic() - totals_refreshed_at
+                >= CATEGORY_TOTALS_REFRESH_SECONDS
+            ):
+                refresh_category_totals_from_pool(db_pool)
+                totals_refreshed_at = time.monotonic()
+            settled_files = debouncer.pop_settled()
+            if not settled_files:
+                continue
+            named_files = [
+                (match_file_to_processor_name(processor_config, file_path), file_path)
+                for file_path in settled_files
+            ]
+            try:
+                with db_pool.connection() as db_conn:
+                    if ingestion_context.job_queue is not None:
+                        process_queued_files(named_files, db_conn, ingestion_context)
+                    else:
+                        process_new_files(
+                            load_processors(named_files), db_conn, ingestion_context
+                        )
+            except Exception as e:
+                # Typically a lost connection; files that were not archived
+                # are tried again with a fresh one once they settle
+                logger.exception(e)
+                for file_path in settled_files:
+                    if file_path.exists():
+                        debouncer.touch(file_path)
+    finally:
+        watcher.close()
 
 
 def create_arg_parser():
@@ -67,6 +734,175 @@ def create_arg_parser():
     parser.add_argument(
         "--config-file", type=str, required=True, help="Path to the configuration file"
     )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=None,
+        help="Number of processes used to parse statement files in parallel "
+        "(default: 1, or the number of CPUs with --once and --backfill)",
+    )
+    run_mode = parser.add_mutually_exclusive_group()
+    run_mode.add_argument(
+        "--watch",
+        action="store_true",
+        help="Process files as soon as they are written instead of scanning every minute",
+    )
+    run_mode.add_argument(
+        "--once",
+        action="store_true",
+        help="Process all files in the configured input directories once and exit",
+    )
+    run_mode.add_argument(
+        "--requeue-quarantined",
+        action="store_true",
+        help="Move all quarantined files back to their input directory and exit",
+    )
+    run_mode.add_argument(
+        "--validate-balances",
+        action="store_true",
+        help="Check debit balance continuity for rows added since the last check, report "
+        "every unresolved break and exit with status 1 if there are any",
+    )
+    run_mode.add_argument(
+        "--check-category-totals",
+        action="store_true",
+        help="Refresh the monthly category totals, compare them with the transaction "
+        "rows they are built from and exit",
+    )
+    run_mode.add_argument(
+        "--refresh-category-totals",
+        action="store_true",
+        help="Aggregate the monthly category totals of every month marked stale and exit",
+    )
+    run_mode.add_argument(
+        "--backfill",
+        type=Path,
+        default=None,
+        metavar="DIR",
+        help="Process all files under DIR matching the configured globs once and exit",
+    )
+    parser.add_argument(
+        "--settle-seconds",
+        type=float,
+        default=2.0,
+        help="Time a file must stay unchanged before it is processed in watch mode",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=60.0,
+        help="Scan interval in seconds when inotify is not available in watch mode",
+    )
+    parser.add_argument(
+        "--hash-cache-file",
+        type=Path,
+        default=None,
+        help="JSON file caching file hashes by path, mtime and size",
+    )
+    parser.add_argument(
+        "--db-pool-size",
+        type=int,
+        default=2,
+        help="Maximum number of pooled Postgres connections held by the daemon",
+    )
+    parser.add_argument(
+        "--parse-cache-dir",
+        type=Path,
+        default=None,
+        help="Directory caching parsed statements as Parquet, keyed by file hash",
+    )
+    parser.add_argument(
+        "--parse-cache-max-mb",
+        type=int,
+        default=1024,
+        help="Size above which least recently used parse cache entries are evicted",
+    )
+    parser.add_argument(
+        "--rebuild-parse-cache",
+        action="store_true",
+        help="Drop all parse cache entries at startup so every file is parsed again",
+    )
+    parser.add_argument(
+        "--reingest",
+        action="store_true",
+        help="Load files again even if their content is already in the ingestion ledger, "
+        "for example after a parser fix (files repeated within this run are still skipped)",
+    )
+    parser.add_argument(
+        "--from-scratch",
+        action="store_true",
+        help="With --validate-balances, check the whole history instead of new rows only",
+    )
+    parser.add_argument(
+        "--no-balance-validation",
+        action="store_true",
+        help="Do not check debit balance continuity after loading files",
+    )
+    parser.add_argument(
+        "--no-quarantine",
+        action="store_true",
+        help="Leave failed files in place so they are retried every cycle",
+    )
+    parser.add_argument(
+        "--retry-base-minutes",
+        type=float,
+        default=5.0,
+        help="Delay before a quarantined file is first retried, doubled on every failure",
+    )
+    parser.add_argument(
+        "--retry-max-hours",
+        type=float,
+        default=24.0,
+        help="Upper bound on the delay between retries of a quarantined file",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=None,
+        help="Statements parsed ahead of the database writer "
+        "(default: the number of parse workers, at least 2)",
+    )
+    parser.add_argument(
+        "--stream-above-mb",
+        type=float,
+        default=64.0,
+        help="Load files at least this large in fixed-size batches to bound memory",
+    )
+    parser.add_argument(
+        "--compress-archive",
+        action="store_true",
+        help="Gzip processed files when moving them to the archive directory",
+    )
+    parser.add_argument(
+        "--job-queue",
+        action="store_true",
+        help="Coordinate with other daemons on the same input directories through a "
+        "job table in Postgres, so every file is processed by a single worker",
+    )
+    parser.add_argument(
+        "--worker-id",
+        type=str,
+        default=None,
+        help="Name recorded on claimed jobs (default: hostname:pid)",
+    )
+    parser.add_argument(
+        "--job-lease-minutes",
+        type=float,
+        default=30.0,
+        help="Time after which files claimed by a crashed worker can be claimed again",
+    )
+    parser.add_argument(
+        "--claim-batch-size",
+        type=int,
+        default=None,
+        help="Files claimed from the job table at a time (default: the pipeline depth)",
+    )
+    parser.add_argument(
+        "--metrics-textfile",
+        type=Path,
+        default=None,
+        help="Prometheus node-exporter textfile (.prom) rewritten after every cycle",
+    )
     return parser.parse_args()
 
 
@@ -75,9 +911,134 @@ def main() -> None:
     config = get_config(args.config_file)
     logger.info("Starting statement file processor with config: %s", config)
     processor_config = get_processor_config(config=config)
+    quarantine = FileQuarantine(
+        retry_base_seconds=args.retry_base_minutes * 60,
+        retry_max_seconds=args.retry_max_hours * 3600,
+    )
+    if args.requeue_quarantined:
+        requeued_files = quarantine.requeue(
+            [conf.input_dir for conf in processor_config.values()], due_only=False
+        )
+        logger.info("Requeued %d quarantined files", len(requeued_files))
+        return
+    db_pool = IngestionConnectionPool(
+        config.postgres_conn_str, max_connections=args.db_pool_size
+    )
+    prepare_database(db_pool)
+    if args.validate_balances:
+        with db_pool.connection() as db_conn:
+            balance_breaks = validate_balance_continuity(
+                db_conn, from_scratch=args.from_scratch
+            )
+        db_pool.close()
+        sys.exit(1 if balance_breaks else 0)
+    if args.check_category_totals:
+        with db_pool.connection() as db_conn:
+            mismatches = check_category_totals(db_conn)
+        db_pool.close()
+        sys.exit(1 if mismatches else 0)
+    if args.refresh_category_totals:
+        with db_pool.connection() as db_conn:
+            refresh_category_totals(db_conn)
+        db_pool.close()
+        return
+    is_one_shot = args.once or args.backfill is not None
+    parse_workers = args.parse_workers
+    if parse_workers is None:
+        parse_workers = (os.cpu_count() or 1) if is_one_shot else 1
+    parse_executor = None
+    if parse_workers > 1:
+        parse_executor = ProcessPoolExecutor(max_workers=parse_workers)
+    digest_cache = None
+    if args.hash_cache_file is not None:
+        digest_cache = FileDigestCache(args.hash_cache_file)
+    parse_cache = None
+    if args.parse_cache_dir is not None:
+        parse_cache = ParseCache(
+            args.parse_cache_dir, args.parse_cache_max_mb * 1024 * 1024
+        )
+        if args.rebuild_parse_cache:
+            parse_cache.clear()
+    pipeline_depth = args.pipeline_depth or max(parse_workers, 2)
+    reingest_since = None
+    if args.reingest:
+        with db_pool.connection() as db_conn:
+            with db_conn.cursor() as cur:
+                reingest_since = get_ledger_time(cur)
+            db_conn.rollback()
+        logger.info("Ignoring ingestion ledger entries from before %s", reingest_since)
+    job_queue = None
+    if args.job_queue:
+        job_queue = IngestionJobQueue(
+            queue="input" if args.backfill is None else "backfill",
+            input_roots={
+                processor_name: (
+                    input_file_conf.input_dir
+                    if args.backfill is None
+                    else args.backfill
+                )
+                for processor_name, input_file_conf in processor_config.items()
+            },
+            worker_id=args.worker_id or default_worker_id(),
+            lease_seconds=args.job_lease_minutes * 60,
+            claim_batch_size=args.claim_batch_size or pipeline_depth,
+        )
+    ingestion_context = IngestionContext(
+        parse_executor=parse_executor,
+        digest_cache=digest_cache,
+        parse_cache=parse_cache,
+        metrics=IngestionMetrics(args.metrics_textfile),
+        quarantine=None if args.no_quarantine else quarantine,
+        archive=FileArchive(compress=args.compress_archive),
+        stream_min_bytes=int(args.stream_above_mb * 1024 * 1024),
+        pipeline_depth=pipeline_depth,
+        validate_balances=not args.no_balance_validation,
+        job_queue=job_queue,
+        reingest_since=reingest_since,
+    )
+    for input_file_conf in processor_config.values():
+        ingestion_context.archive.archive_legacy_success_files(
+            input_file_conf.input_dir
+        )
+    if is_one_shot:
+        if args.backfill is not None:
+            named_files = scan_backfill_files(processor_config, args.backfill)
+        else:
+            named_files = scan_new_files(processor_config)
+        logger.info("Found %d files to process", len(named_files))
+        with db_pool.connection() as db_conn:
+            if job_queue is not None:
+                summaries = process_queued_files(
+                    named_files, db_conn, ingestion_context
+                )
+            else:
+                summaries = [
+                    process_new_files(
+                        load_processors(named_files), db_conn, ingestion_context
+                    )
+                ]
+        if parse_executor is not None:
+            parse_executor.shutdown()
+        db_pool.close()
+        sys.exit(1 if any(summary.failed for summary in summaries) else 0)
+    if args.watch:
+        watch_input_dirs(
+            processor_config,
+            db_pool,
+            ingestion_context,
+            args.settle_seconds,
+            args.poll_interval,
+        )
+        return
     while True:
-        db_conn = psycopg2.connect(config.postgres_conn_str)
         logger.info("Searching files")
-        delegate_new_files_to_processor(processor_config, db_conn)
+        try:
+            with db_pool.connection() as db_conn:
+                delegate_new_files_to_processor(
+                    processor_config, db_conn, ingestion_context
+                )
+        except Exception as e:
+            # Typically a lost connection, the pool reconnects next cycle
+            logger.exception(e)
+        refresh_category_totals_from_pool(db_pool)
         sleep(60)
-        db_conn.close()
@@ -0,0 +1,86 @@
+from typing import Optional
+from psycopg2 import sql
+import io
+import polars as pl
+import psycopg2
+
+# Postgres type OIDs read straight into an Arrow type by the CSV reader
+_CSV_DTYPES = {
+    20: pl.Int64,
+    21: pl.Int16,
+    23: pl.Int32,
+    26: pl.UInt32,
+    700: pl.Float32,
+    701: pl.Float64,
+    1082: pl.Date,
+}
+BOOL_OID = 16
+NUMERIC_OID = 1700
+TIMESTAMP_OID = 1114
+TIMESTAMPTZ_OID = 1184
+# psycopg2 reports the scale of a numeric without typmod, sum() results
+# included, as 0xFFFF rather than None
+UNCONSTRAINED_NUMERIC_SCALE = 65535
+
+
+def _numeric_scale(column: psycopg2.extensions.Column) -> Optional[int]:
+    if column.scale in (None, UNCONSTRAINED_NUMERIC_SCALE):
+        return None
+    return column.scale
+
+
+def _column_dtype(column: psycopg2.extensions.Column) -> pl.DataType:
+    if column.type_code == NUMERIC_OID and _numeric_scale(column) is not None:
+        return pl.Decimal(None, column.scale)
+    # Everything else, json included, arrives as its text form
+    return _CSV_DTYPES.get(column.type_code, pl.String)
+
+
+def _convert_text_column(
+    frame: pl.DataFrame, column: psycopg2.extensions.Column
+) -> Optional[pl.Expr]:
+    col = pl.col(column.name)
+    if column.type_code == BOOL_OID:
+        return col == "t"
+    if column.type_code == NUMERIC_OID and _numeric_scale(column) is None:
+        # Unconstrained numeric, the widest scale in the result is kept
+        return col.str.to_decimal(inference_length=max(len(frame), 1))
+    if column.type_code == TIMESTAMP_OID:
+        return col.str.to_datetime("%Y-%m-%d %H:%M:%S%.f")
+    if column.type_code == TIMESTAMPTZ_OID:
+        # Postgres prints whole-hour offsets as +01
+        return col.str.replace(r"([+-]\d{2})$", "${1}:00").str.to_datetime(
+            "%Y-%m-%d %H:%M:%S%.f%:z", time_zone="UTC"
+        )
+    return None
+
+
+def fetch_polars_frame(
+    cur: psycopg2.extensions.cursor, query: str, params=None
+) -> pl.DataFrame:
+    # psycopg2 interpolates parameters client side anyway, COPY takes none
+    query_text = cur.mogrify(query, params).decode(
+        psycopg2.extensions.encodings[cur.connection.encoding]
+    )
+    subquery = sql.SQL(query_text)
+    cur.execute(sql.SQL("SELECT * FROM ({}) q LIMIT 0").format(subquery))
+    columns = cur.description
+
+    buffer = io.BytesIO()
+    cur.copy_expert(
+        sql.SQL("COPY ({}) TO STDOUT WITH (FORMAT csv, HEADER true)")
+        .format(subquery)
+        .as_string(cur),
+        buffer,
+    )
+    buffer.seek(0)
+    frame = pl.read_csv(
+        buffer,
+        schema={column.name: _column_dtype(column) for column in columns},
+    )
+    conversions = [
+        expr
+        for expr in (_convert_text_column(frame, column) for column in columns)
+        if expr is not None
+    ]
+    return frame.with_columns(conversions) if conversions else frame
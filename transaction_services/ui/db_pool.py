@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+from typing import Iterator
+from psycopg2 import pool
+import psycopg2
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Connections are shared by every browser session of the dashboard process
+DASHBOARD_MAX_CONNECTIONS = 4
+# A pooled connection idle for longer than this is pinged before it is reused
+HEALTH_CHECK_IDLE_SECONDS = 30.0
+BORROW_TIMEOUT_SECONDS = 30.0
+
+
+class DashboardConnectionPool:
+    def __init__(
+        self,
+        postgres_conn_str: str,
+        max_connections: int = DASHBOARD_MAX_CONNECTIONS,
+        borrow_timeout_seconds: float = BORROW_TIMEOUT_SECONDS,
+    ):
+        self._pool = pool.ThreadedConnectionPool(0, max_connections, postgres_conn_str)
+        # ThreadedConnectionPool raises once it is exhausted; sessions wait
+        # for a free connection instead
+        self._available = threading.BoundedSemaphore(max_connections)
+        self._returned_at: dict[int, float] = {}
+        self.borrow_timeout_seconds = borrow_timeout_seconds
+
+    def _is_healthy(self, db_conn: psycopg2.extensions.connection) -> bool:
+        if db_conn.closed:
+            return False
+        returned_at = self._returned_at.get(id(db_conn))
+        if (
+            returned_at is not None
+            and time.monotonic() - returned_at < HEALTH_CHECK_IDLE_SECONDS
+        ):
+            return True
+        try:
+            with db_conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            db_conn.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _get_healthy_connection(self) -> psycopg2.extensions.connection:
+        while True:
+            db_conn = self._pool.getconn()
+            if self._is_healthy(db_conn):
+                return db_conn
+            logger.warning("Discarding broken pooled connection")
+            self._returned_at.pop(id(db_conn), None)
+            self._pool.putconn(db_conn, close=True)
+
+    @contextmanager
+    def connection(self) -> Iterator[psycopg2.extensions.connection]:
+        if not self._available.acquire(timeout=self.borrow_timeout_seconds):
+            raise pool.PoolError(
+                f"No database connection free after {self.borrow_timeout_seconds:.0f}s"
+            )
+        try:
+            db_conn = self._get_healthy_connection()
+            try:
+                yield db_conn
+            finally:
+                # Views leave read transactions open and st.rerun() aborts a
+                # render halfway, so whatever was not committed is dropped
+                try:
+                    if not db_conn.closed:
+                        db_conn.rollback()
+                except psycopg2.Error:
+                    db_conn.close()
+                if db_conn.closed:
+                    self._returned_at.pop(id(db_conn), None)
+                else:
+                    self._returned_at[id(db_conn)] = time.monotonic()
+                self._pool.putconn(db_conn, close=bool(db_conn.closed))
+        finally:
+            self._available.release()
@@ -1,5 +1,8 @@
 import streamlit as st
-from transaction_services.ui.views.base_views import BaseStreamlitView
+from transaction_services.ui.views.base_views import (
+    BaseStreamlitView,
+    missing_daemon_tables,
+)
 from transaction_services.ui.views.cash_category_linking import (
     ManageCashCategories,
     DebitCashCategoryLinking,
@@ -78,6 +81,13 @@ def get_cached_config():
 
 def main():
     postgres_conn_str = get_cached_config().postgres_conn_str
+    missing_tables = missing_daemon_tables(postgres_conn_str)
+    if missing_tables:
+        st.error(
+            f"Tables {', '.join(missing_tables)} do not exist yet, start the "
+            "statement import daemon once to create them"
+        )
+        st.stop()
     available_views: list[BaseStreamlitView] = [
         ExpenditureGraph(postgres_conn_str),
         ManageCashCategories(postgres_conn_str),
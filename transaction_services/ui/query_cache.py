@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from typing import Callable, Union
+from transaction_services.config.data_versions import (
+    get_data_versions,
+    tables_in_query,
+)
+from transaction_services.ui.arrow_fetch import fetch_polars_frame
+import pandas as pd
+import polars as pl
+import psycopg2
+import threading
+import time
+
+MAX_CACHED_QUERIES = 64
+# Writes by this process are seen at once; writes by the ingestion daemon
+# or another dashboard process within this many seconds
+VERSION_POLL_SECONDS = 5.0
+
+Frame = Union[pd.DataFrame, pl.DataFrame]
+
+
+def fetch_pandas_frame(
+    cur: psycopg2.extensions.cursor, query: str, params=None
+) -> pd.DataFrame:
+    cur.execute(query, params)
+    return pd.DataFrame(cur.fetchall(), columns=[desc[0] for desc in cur.description])
+
+
+class QueryCache:
+    # Query results shared by all sessions, keyed by loader, SQL text and
+    # parameters and tagged with the versions of the tables the query reads
+    def __init__(
+        self,
+        max_entries: int = MAX_CACHED_QUERIES,
+        version_poll_seconds: float = VERSION_POLL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.version_poll_seconds = version_poll_seconds
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[str, str, str], tuple[dict, Frame]] = (
+            OrderedDict()
+        )
+        self._versions: dict[str, int] = {}
+        self._versions_polled_at = float("-inf")
+
+    def _current_versions(self, cur: psycopg2.extensions.cursor) -> dict[str, int]:
+        if time.monotonic() - self._versions_polled_at >= self.version_poll_seconds:
+            self._versions = get_data_versions(cur)
+            self._versions_polled_at = time.monotonic()
+        return self._versions
+
+    def _fetch(
+        self,
+        cur: psycopg2.extensions.cursor,
+        query: str,
+        params,
+        loader: Callable[..., Frame],
+    ) -> Frame:
+        key = (loader.__name__, query, repr(params))
+        with self._lock:
+            versions = self._current_versions(cur)
+            read_versions = {
+                table: versions.get(table, 0) for table in tables_in_query(query)
+            }
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == read_versions:
+                self._entries.move_to_end(key)
+                return entry[1]
+        frame = loader(cur, query, params)
+        with self._lock:
+            self._entries[key] = (read_versions, frame)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return frame
+
+    def fetch_frame(
+        self, cur: psycopg2.extensions.cursor, query: str, params=None
+    ) -> pd.DataFrame:
+        return self._fetch(cur, query, params, fetch_pandas_frame)
+
+    def fetch_polars_frame(
+        self, cur: psycopg2.extensions.cursor, query: str, params=None
+    ) -> pl.DataFrame:
+        return self._fetch(cur, query, params, fetch_polars_frame)
+
+    def record_versions(self, versions: dict[str, int]) -> None:
+        # Called after a commit with the versions that commit produced
+        with self._lock:
+            for table, version in versions.items():
+                if version > self._versions.get(table, 0):
+                    self._versions[table] = version
+
+    def refresh(self) -> None:
+        # Explicit refresh: drop every cached result, including those of
+        # tables written without a data_versions bump, and re-poll versions
+        with self._lock:
+            self._entries.clear()
+            self._versions_polled_at = float("-inf")
@@ -1,14 +1,85 @@
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterator
+from transaction_services.config.data_versions import bump_data_versions
+from transaction_services.config.db_constants import (
+    TX_SCHEMA,
+    DATA_VERSIONS_TABLE,
+    DIRTY_TOTALS_MONTHS_TABLE,
+    MONTHLY_CATEGORY_TOTALS_TABLE,
+)
+from transaction_services.ui.db_pool import DashboardConnectionPool
+from transaction_services.ui.query_cache import QueryCache
 import datetime
 import dateutil
+import pandas as pd
+import polars as pl
+import psycopg2
 import streamlit as st
 
 
+# Created and migrated by the ingestion daemon, the dashboard runs no DDL
+DAEMON_TABLES = [
+    DATA_VERSIONS_TABLE,
+    MONTHLY_CATEGORY_TOTALS_TABLE,
+    DIRTY_TOTALS_MONTHS_TABLE,
+]
+
+
+@st.cache_resource
+def get_connection_pool(db_conn_str: str) -> DashboardConnectionPool:
+    return DashboardConnectionPool(db_conn_str)
+
+
+def missing_daemon_tables(db_conn_str: str) -> list[str]:
+    with get_connection_pool(db_conn_str).connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT table_name FROM unnest(%s::text[]) AS table_name"
+                " WHERE to_regclass(%s || '.' || table_name) IS NULL",
+                (DAEMON_TABLES, TX_SCHEMA),
+            )
+            missing_tables = [table_name for (table_name,) in cur.fetchall()]
+        conn.rollback()
+    return missing_tables
+
+
+@st.cache_resource
+def get_query_cache() -> QueryCache:
+    return QueryCache()
+
+
 class BaseStreamlitView(ABC):
     def __init__(self, db_conn_str: str):
         super().__init__()
         self.db_conn_str = db_conn_str
 
+    @contextmanager
+    def db_connection(self) -> Iterator[psycopg2.extensions.connection]:
+        with get_connection_pool(self.db_conn_str).connection() as conn:
+            yield conn
+
+    def fetch_frame(
+        self, cur: psycopg2.extensions.cursor, query: str, params=None
+    ) -> pd.DataFrame:
+        # Row selections rerun the script; served from the shared cache until
+        # a table the query reads is written
+        return get_query_cache().fetch_frame(cur, query, params)
+
+    def fetch_polars_frame(
+        self, cur: psycopg2.extensions.cursor, query: str, params=None
+    ) -> pl.DataFrame:
+        # Typed columns straight from COPY; st.dataframe takes them as Arrow
+        return get_query_cache().fetch_polars_frame(cur, query, params)
+
+    def commit_changes(
+        self, conn: psycopg2.extensions.connection, *tables: str
+    ) -> None:
+        with conn.cursor() as cur:
+            versions = bump_data_versions(cur, tables)
+        conn.commit()
+        get_query_cache().record_versions(versions)
+
     @abstractmethod
     def view_name(self) -> str: ...
 
@@ -41,6 +112,7 @@ class TimeRangeView(BaseStreamlitView):
             self.first_render = False
 
         if st.button("Refresh"):
+            get_query_cache().refresh()
             st.rerun(scope="fragment")
 
         tx_to_default = st.session_state.get("tx_to", datetime.date.today())